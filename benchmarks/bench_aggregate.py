@@ -0,0 +1,60 @@
+#!/bin/python
+
+# Time needed to aggregate the repetitions of an experiment into means and errors, including a bootstrap confidence
+# interval, also of a few large groups, and compared with resampling each group in a Python loop.
+#
+# Usage: python benchmarks/bench_aggregate.py [ROWS] [REPETITIONS] [RESAMPLES]
+
+
+import numpy as np
+import os.path as osp
+import pandas as pd
+import sys
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+
+
+def loop_bootstrap(df, resamples, rng):
+    lower, upper = [], []
+    for _, values in df.groupby("x")["y"]:
+        values = values.values
+        means = [rng.choice(values, len(values)).mean() for _ in range(resamples)]
+        lo, hi = np.percentile(means, [2.5, 97.5])
+        lower.append(lo)
+        upper.append(hi)
+    return lower, upper
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    resamples = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    rng = np.random.default_rng(0)
+    x = np.repeat(np.arange(rows // repetitions), repetitions)
+    df = pd.DataFrame({"x": x, "y": x + rng.standard_normal(len(x))})
+
+    print("{} rows, {} repetitions, {} resamples".format(len(df), repetitions, resamples))
+    print("{:<12} {:>10}".format("", "time (s)"))
+    for error in ["std", "sem", "percentile", "bootstrap"]:
+        start = time.perf_counter()
+        plot.aggregate_data(df, ["x"], ["y"], error=error, resamples=resamples)
+        print("{:<12} {:>10.2f}".format(error, time.perf_counter() - start))
+
+    # A few large groups: the resamples are drawn in chunks, so the memory does not grow with them
+    few = pd.DataFrame({"x": np.repeat(np.arange(4), rows // 4), "y": rng.standard_normal(rows // 4 * 4)})
+    start = time.perf_counter()
+    plot.aggregate_data(few, ["x"], ["y"], error="bootstrap", resamples=resamples)
+    print("{:<12} {:>10.2f} (4 groups of {} rows)".format("bootstrap", time.perf_counter() - start, rows // 4))
+
+    # The loop is too slow for all the groups, so it is timed on some of them and extrapolated
+    groups = min(200, rows // repetitions)
+    start = time.perf_counter()
+    loop_bootstrap(df[df["x"] < groups], resamples, rng)
+    print("{:<12} {:>10.2f} (extrapolated from {} groups)".format("loop", (time.perf_counter() - start) * (rows // repetitions) / groups, groups))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/bin/python
+
+# Artists created, time needed and size of the PDF of a stacked bar plot of many bars, drawn with a patch per bar
+# or with a PolyCollection per column.
+#
+# Usage: python benchmarks/bench_bars.py [BARS] [COLUMNS]
+
+
+import matplotlib as mpl; mpl.use("Agg")
+import numpy as np
+import os.path as osp
+import pandas as pd
+import shlex
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+import simplot
+
+
+def render(datafile, output, renderer):
+    args = "--plot '{{kind: sb, datafile: {}, index: 0, renderer: {}, legend: false}}' --size 11.6 4 -o {}".format(datafile, renderer, output)
+    args = simplot.parse_args(shlex.split(args))
+    start = time.perf_counter()
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    built = time.perf_counter() - start
+    artists = len(figs[0].findobj())
+    simplot.write_output(figs, args.output, args.rect)
+    return artists, built, time.perf_counter() - start, osp.getsize(output)
+
+
+def main():
+    bars = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datafile = osp.join(tmp, "ways.csv")
+        values = np.random.dirichlet(np.ones(columns), bars)
+        df = pd.DataFrame(values, columns=[str(2 * (i + 1)) for i in range(columns)])
+        df.insert(0, "Applications", ["app{}".format(i) for i in range(bars)])
+        df.to_csv(datafile, index=False)
+
+        # Read the datafile once, so only drawing is measured
+        plot.Plot.dfs[datafile] = plot.read_data(datafile)
+
+        print("{} bars x {} columns".format(bars, columns))
+        print("{:<12} {:>10} {:>12} {:>12} {:>12}".format("", "artists", "build (s)", "total (s)", "PDF (KB)"))
+        for renderer in ["artists", "collection"]:
+            artists, built, total, size = render(datafile, osp.join(tmp, renderer + ".pdf"), renderer)
+            print("{:<12} {:>10} {:>12.2f} {:>12.2f} {:>12.1f}".format(renderer, artists, built, total, size / 2**10))
+
+
+if __name__ == "__main__":
+    main()
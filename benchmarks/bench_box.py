@@ -0,0 +1,43 @@
+#!/bin/python
+
+# Time needed to draw a box plot of large samples by giving them to plt.boxplot as lists (as it used to be done) or by
+# summarizing them with box_stats and drawing the summaries with Axes.bxp.
+#
+# Usage: python benchmarks/bench_box.py [COLUMNS] [SAMPLES]
+
+
+import matplotlib as mpl; mpl.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import os.path as osp
+import sys
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+
+
+def main():
+    columns = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 10**7
+
+    values = np.random.lognormal(size=(samples, columns))
+
+    print("{} columns of {} samples".format(columns, samples))
+    print("{:<12} {:>10}".format("", "time (s)"))
+
+    start = time.perf_counter()
+    plt.figure()
+    plt.boxplot(values.T.tolist())
+    print("{:<12} {:>10.2f}".format("lists", time.perf_counter() - start))
+    plt.close("all")
+
+    start = time.perf_counter()
+    plt.figure()
+    plt.gca().bxp([plot.box_stats(values[:, c], maxfliers=1000) for c in range(columns)])
+    print("{:<12} {:>10.2f}".format("box_stats", time.perf_counter() - start))
+    plt.close("all")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/bin/python
+
+# Time, memory and disk needed to read compressed CSV files, decompressing them to disk first
+# and decompressing them as they are parsed.
+#
+# Usage: python benchmarks/bench_compressed.py [ROWS]
+
+
+import bz2
+import gzip
+import lzma
+import numpy as np
+import os.path as osp
+import pandas as pd
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+
+
+def measure(fun):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fun()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def compress(datafile, ext):
+    output = datafile + ext
+    if ext == ".zst":
+        if not shutil.which("zstd"):
+            return None
+        subprocess.check_call(["zstd", "-q", "-f", datafile, "-o", output])
+        return output
+    opener = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}[ext]
+    with open(datafile, "rb") as src, opener(output, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return output
+
+
+def decompress_then_read(datafile, tmp):
+    output = osp.join(tmp, "decompressed.csv")
+    with plot.open_datafile(datafile) as src, open(output, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    plot.read_data(output, ["time", "c0", "c1"])
+    return osp.getsize(output)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datafile = osp.join(tmp, "data.csv")
+        df = pd.DataFrame(np.random.rand(rows, 8), columns=["c{}".format(c) for c in range(8)])
+        df.insert(0, "time", np.arange(rows))
+        df.to_csv(datafile, index=False)
+        print("{} rows, {:.1f} MB uncompressed".format(rows, osp.getsize(datafile) / 2**20))
+
+        print("{:<6} {:<12} {:>10} {:>14} {:>14}".format("", "", "time (s)", "peak RAM (MB)", "disk (MB)"))
+        for ext in [".gz", ".xz", ".zst", ".bz2"]:
+            compressed = compress(datafile, ext)
+            if not compressed:
+                continue
+            disk = []
+            t1, m1 = measure(lambda: disk.append(decompress_then_read(compressed, tmp)))
+            t2, m2 = measure(lambda: plot.read_data(compressed, ["time", "c0", "c1"]))
+            print("{:<6} {:<12} {:>10.2f} {:>14.1f} {:>14.1f}".format(ext, "to disk", t1, m1 / 2**20, disk[0] / 2**20))
+            print("{:<6} {:<12} {:>10.2f} {:>14.1f} {:>14.1f}".format(ext, "streaming", t2, m2 / 2**20, 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/bin/python
+
+# Time needed to parse a column of timestamps as read from a CSV file, by pandas inference, by pandas with a fixed
+# format and by parse_dates, which parses fixed-width formats from the bytes of the strings.
+#
+# Usage: python benchmarks/bench_dates.py [ROWS]
+
+
+import numpy as np
+import os.path as osp
+import pandas as pd
+import sys
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10**7
+    fmt = "%Y-%m-%dT%H:%M:%S"
+
+    dates = pd.date_range("2024-01-01", periods=rows, freq="s")
+    strings = pd.Series(dates.strftime(fmt))
+    epochs = pd.Series(dates.values.astype("datetime64[s]").astype(np.int64))
+
+    print("{} timestamps".format(rows))
+    print("{:<20} {:>10}".format("", "time (s)"))
+    for name, parse in [("pandas inference", lambda: pd.to_datetime(strings)),
+                        ("pandas format", lambda: pd.to_datetime(strings, format=fmt)),
+                        ("parse_dates format", lambda: plot.parse_dates(strings, fmt)),
+                        ("parse_dates unit", lambda: plot.parse_dates(epochs, unit="s"))]:
+        start = time.perf_counter()
+        parse()
+        print("{:<20} {:>10.2f}".format(name, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/bin/python
+
+# Size of the PDF and time needed to draw a long line plot with and without decimation.
+#
+# Usage: python benchmarks/bench_decimate.py [POINTS]
+
+
+import matplotlib as mpl; mpl.use("Agg")
+import numpy as np
+import os.path as osp
+import pandas as pd
+import shlex
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+import simplot
+
+
+def render(datafile, output, extra):
+    args = "--plot '{{kind: l, datafile: {}, index: 0, cols: [1]{}}}' --size 4 2.5 -o {}".format(datafile, extra, output)
+    args = simplot.parse_args(shlex.split(args))
+    start = time.perf_counter()
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    simplot.write_output(figs, args.output, args.rect)
+    return time.perf_counter() - start, osp.getsize(output)
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 5 * 10**6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datafile = osp.join(tmp, "trace.csv")
+        y = np.cumsum(np.random.randn(points))
+        pd.DataFrame({"time": np.arange(points), "value": y}).to_csv(datafile, index=False)
+
+        # Read the datafile once, so only drawing is measured
+        plot.Plot.dfs[datafile] = plot.read_data(datafile)
+
+        print("{} points".format(points))
+        print("{:<12} {:>10} {:>12}".format("", "time (s)", "PDF (KB)"))
+        for name, extra in [("none", ""), ("minmax", ", decimate: minmax"), ("lttb", ", decimate: lttb")]:
+            t, size = render(datafile, osp.join(tmp, name + ".pdf"), extra)
+            print("{:<12} {:>10.2f} {:>12.1f}".format(name, t, size / 2**10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/bin/python
+
+# Time needed to turn the error columns of a line plot into the error arrays of plt.errorbar, as lists (as it used to be
+# done) or as views of the columns, and to build the whole plot with error bands (and error bars, with few points, as
+# matplotlib makes a path per error bar).
+#
+# Usage: python benchmarks/bench_errorbars.py [SERIES] [POINTS]
+
+
+import matplotlib as mpl; mpl.use("Agg")
+import numpy as np
+import os.path as osp
+import pandas as pd
+import shlex
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+import simplot
+
+
+def main():
+    series = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 10**5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        values = np.cumsum(np.random.randn(points, series), axis=0)
+        errors = np.abs(np.random.randn(points, 2 * series))
+        names = ["s{}".format(i) for i in range(series)]
+        enames = ["s{} {}".format(i, bound) for i in range(series) for bound in ["lower", "upper"]]
+        df = pd.DataFrame(np.hstack([np.arange(points)[:, None], values, errors]), columns=["x"] + names + enames)
+
+        # Only the header is read from the datafile, the data is put in Plot.dfs
+        datafile = osp.join(tmp, "series.csv")
+        df.head(1).to_csv(datafile, index=False)
+        plot.Plot.dfs[datafile] = df
+        indexed = df.set_index("x")
+
+        print("{} series of {} points, lower and upper errors".format(series, points))
+        print("{:<12} {:>10}".format("", "time (s)"))
+
+        start = time.perf_counter()
+        for lower, upper in zip(enames[::2], enames[1::2]):
+            yerr = [indexed[lower].tolist(), indexed[upper].tolist()]
+        print("{:<12} {:>10.2f}".format("lists", time.perf_counter() - start))
+
+        obj = plot.LinePlot.unprepared(errorbars="both")
+        obj.df, obj.columns, obj.ecolumns = indexed, names, enames
+        start = time.perf_counter()
+        obj.errors()
+        print("{:<12} {:>10.2f}".format("arrays", time.perf_counter() - start))
+
+        cols = list(range(1, series + 1))
+        ecols = list(range(series + 1, 3 * series + 1))
+        for style in ["band", "bars"] if series * points <= 10**6 else ["band"]:
+            args = "--plot '{{kind: l, datafile: {}, index: 0, cols: {}, ecols: {}, errorstyle: {}, legend: false}}'".format(datafile, cols, ecols, style)
+            args = simplot.parse_args(shlex.split(args))
+            start = time.perf_counter()
+            figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+            simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+            print("{:<12} {:>10.2f}".format("plot " + style, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
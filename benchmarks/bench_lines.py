@@ -0,0 +1,58 @@
+#!/bin/python
+
+# Artists created and time needed to draw a line plot of many series, one artist per series or a single LineCollection,
+# with and without a legend.
+#
+# Usage: python benchmarks/bench_lines.py [SERIES] [POINTS]
+
+
+import matplotlib as mpl; mpl.use("Agg")
+import numpy as np
+import os.path as osp
+import pandas as pd
+import shlex
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+import simplot
+
+
+def render(datafile, cols, output, renderer, legend):
+    args = "--plot '{{kind: l, datafile: {}, index: 0, cols: {}, renderer: {}, colormap: viridis, legend: {}}}' --size 6 4 -o {}".format(datafile, cols, renderer, legend, output)
+    args = simplot.parse_args(shlex.split(args))
+    start = time.perf_counter()
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    built = time.perf_counter() - start
+    artists = len(figs[0].findobj())
+    simplot.write_output(figs, args.output, args.rect)
+    return artists, built, time.perf_counter() - start, osp.getsize(output)
+
+
+def main():
+    series = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datafile = osp.join(tmp, "counters.csv")
+        df = pd.DataFrame(np.cumsum(np.random.randn(points, series), axis=0), columns=["core {}".format(i) for i in range(series)])
+        df.insert(0, "time", np.arange(points))
+        df.to_csv(datafile, index=False)
+
+        # Read the datafile once, so only drawing is measured
+        plot.Plot.dfs[datafile] = plot.read_data(datafile)
+        cols = list(range(1, series + 1))
+
+        print("{} series of {} points".format(series, points))
+        print("{:<12} {:<8} {:>10} {:>12} {:>12} {:>12}".format("", "legend", "artists", "build (s)", "total (s)", "PDF (KB)"))
+        for renderer in ["artists", "collection"]:
+            for legend in ["false", "true"]:
+                artists, built, total, size = render(datafile, cols, osp.join(tmp, renderer + ".pdf"), renderer, legend)
+                print("{:<12} {:<8} {:>10} {:>12.2f} {:>12.2f} {:>12.1f}".format(renderer, legend, artists, built, total, size / 2**10))
+
+
+if __name__ == "__main__":
+    main()
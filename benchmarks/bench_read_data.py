@@ -0,0 +1,58 @@
+#!/bin/python
+
+# Time and memory needed to read a wide CSV file when all the columns are parsed
+# and when only the columns used by the plots are parsed.
+#
+# Usage: python benchmarks/bench_read_data.py [ROWS] [COLS]
+
+
+import numpy as np
+import os
+import os.path as osp
+import pandas as pd
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+import plot
+
+
+def measure(fun):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = fun()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datafile = osp.join(tmp, "wide.csv")
+        data = np.random.rand(rows, cols)
+        df = pd.DataFrame(data, columns=["c{}".format(c) for c in range(cols)])
+        df.insert(0, "time", np.arange(rows))
+        df.to_csv(datafile, index=False)
+        print("{} rows x {} cols, {:.1f} MB on disk".format(rows, cols + 1, osp.getsize(datafile) / 2**20))
+
+        header = plot.read_header(datafile)
+        used = [header[0], header[1], header[2], header[3]]
+        dtype = {name: np.float64 for name in used[1:]}
+
+        full, t_full, m_full = measure(lambda: plot.read_data(datafile))
+        proj, t_proj, m_proj = measure(lambda: plot.read_data(datafile, used, dtype))
+
+        print("{:<12} {:>10} {:>14} {:>14}".format("", "time (s)", "peak (MB)", "frame (MB)"))
+        for name, df, t, m in [("all cols", full, t_full, m_full), ("projected", proj, t_proj, m_proj)]:
+            size = df.memory_usage(deep=True).sum()
+            print("{:<12} {:>10.3f} {:>14.1f} {:>14.2f}".format(name, t, m / 2**20, size / 2**20))
+
+
+if __name__ == "__main__":
+    main()
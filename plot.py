@@ -1,13 +1,34 @@
+import ast
+import bz2
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import glob
+import gzip
+import hashlib
+import io
 import itertools as it
+import lzma
 import matplotlib as mpl
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import numpy as np
+import operator
+import os
+import os.path as osp
 import pandas as pd
 import random
 import re
+import shutil
+import sqlite3
+import subprocess
 import sys
+import threading
 import traceback
+import urllib.request
+import weakref
 
 from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.ticker import FuncFormatter
@@ -15,20 +36,991 @@ from termcolor import colored
 from cycler import cycler
 from matplotlib.patches import Patch
 from matplotlib.lines import Line2D
+from matplotlib.collections import LineCollection, PolyCollection
 
 
-# Read CSV file and transform it to a pandas dataframe
-def read_data(datafile):
+# Format of a datafile, from its extension: CSV unless it is Parquet, Arrow (Feather), NumPy or a SQLite database
+# The datafiles of a list or a glob pattern are all of the format of the first one
+def datafile_format(datafile):
+    datafile = first_datafile(datafile)
+    extensions = {".parquet": "parquet", ".pq": "parquet", ".feather": "arrow", ".arrow": "arrow", ".ipc": "arrow", ".npy": "npy", ".npz": "npz",
+            ".db": "sqlite", ".sqlite": "sqlite", ".sqlite3": "sqlite"}
+    if datafile_compression(datafile):
+        datafile = osp.splitext(datafile)[0]
+    return extensions.get(osp.splitext(datafile)[1].lower(), "csv")
+
+
+compressions = {".gz": "gzip", ".xz": "xz", ".zst": "zstd", ".bz2": "bz2"}
+
+
+# Compression of a datafile, from its extension, or None
+def datafile_compression(datafile):
+    return compressions.get(osp.splitext(first_datafile(datafile))[1].lower())
+
+
+# Paths of the datafiles of a plot: datafile can be a path, a glob pattern (e.g. "results/run-*.csv") or a list of them
+def datafiles(datafile):
+    paths = []
+    for pattern in datafile if isinstance(datafile, (list, tuple)) else [datafile]:
+        if re.search(r"[*?[]", pattern):
+            matches = sorted(glob.glob(pattern))
+            assert matches, colored("No datafile matches '{}'".format(pattern), "red")
+            paths += matches
+        else:
+            paths.append(pattern)
+    return paths
+
+
+# If datafile is a list or a glob pattern, so its data is the concatenation of several datafiles
+def multiple_datafiles(datafile):
+    return isinstance(datafile, (list, tuple)) or re.search(r"[*?[]", datafile) != None
+
+
+def first_datafile(datafile):
+    return datafile[0] if isinstance(datafile, (list, tuple)) else datafile
+
+
+# Hashable datafile, to be part of the keys of Plot.headers and Plot.dfs
+def datafile_key(datafile):
+    return tuple(datafile) if isinstance(datafile, list) else datafile
+
+
+# Decompressors that write to stdout, the first one available is used
+# They run in parallel with the parser and, if they can, with several threads (pzstd only for files compressed by itself)
+decompressors = {
+    "gzip": [["pigz", "-dc"], ["gzip", "-dc"]],
+    "xz": [["xz", "-dc", "-T0"]],
+    "zstd": [["pzstd", "-dc"], ["zstd", "-dc", "-T0"]],
+    "bz2": [["lbzip2", "-dc"], ["pbzip2", "-dc"], ["bzip2", "-dc"]],
+}
+
+
+# Open a CSV datafile, decompressing it as it is read if it is compressed
+# Uncompressed datafiles are given as a path, for pandas to open them
+@contextlib.contextmanager
+def open_datafile(datafile):
+    compression = datafile_compression(datafile)
+    if compression == None:
+        yield datafile
+        return
+    assert datafile_format(datafile) == "csv", colored("Only CSV datafiles can be compressed, not '{}'".format(datafile), "red")
+
+    for command in decompressors[compression]:
+        if shutil.which(command[0]):
+            proc = subprocess.Popen(command + [datafile], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                yield proc.stdout
+            finally:
+                # Stop it if the whole file was not needed, e.g. only the header
+                finished = proc.stdout.read(1) == b""
+                if not finished:
+                    proc.terminate()
+                proc.stdout.close()
+                error = proc.stderr.read()
+                proc.stderr.close()
+                proc.wait()
+            if finished and proc.returncode != 0:
+                raise IOError("{} failed: {}".format(" ".join(command), error.decode(errors="replace").strip()))
+            return
+
+    # No external decompressor, decompress in this process
+    if compression == "zstd":
+        import zstandard
+        with open(datafile, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as f:
+            yield f
+    else:
+        opener = {"gzip": gzip.open, "xz": lzma.open, "bz2": bz2.open}[compression]
+        with opener(datafile, "rb") as f:
+            yield f
+
+
+# Parse a pandas query expression (see DataFrame.query) with the Python parser
+# Column names between backticks are replaced by placeholders, returned with the names they stand for
+def parse_expression(where):
+    names = dict()
+    def placeholder(match):
+        name = "__col{}__".format(len(names))
+        names[name] = match.group(1)
+        return name
+    tree = ast.parse(re.sub(r"`([^`]*)`", placeholder, where), mode="eval")
+    return tree, names
+
+
+# Names of the columns referenced by a pandas query expression
+def expression_columns(where):
+    tree, names = parse_expression(where)
+    return [names.get(node.id, node.id) for node in ast.walk(tree) if isinstance(node, ast.Name)]
+
+
+# Translate a pandas query expression to a pyarrow expression, so Parquet and Arrow datafiles are filtered while they are read
+# Only comparisons of columns and constants joined with and/or/not are supported, otherwise ValueError is raised
+def arrow_filter(where):
+    import pyarrow.compute as pc
+    tree, names = parse_expression(where)
+    comparisons = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge}
+
+    def convert(node):
+        if isinstance(node, ast.BoolOp):
+            join = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+            return functools.reduce(join, [convert(v) for v in node.values])
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            join = operator.and_ if isinstance(node.op, ast.BitAnd) else operator.or_
+            return join(convert(node.left), convert(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert)):
+            return ~convert(node.operand)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+            return -node.operand.value
+        if isinstance(node, ast.Compare):
+            result = None
+            left = node.left
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    term = convert(left).isin(convert(right))
+                    if isinstance(op, ast.NotIn):
+                        term = ~term
+                elif type(op) in comparisons:
+                    term = comparisons[type(op)](convert(left), convert(right))
+                else:
+                    raise ValueError("Unsupported comparison in '{}'".format(where))
+                result = term if result is None else result & term
+                left = right
+            return result
+        if isinstance(node, ast.Name):
+            return pc.field(names.get(node.id, node.id))
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [convert(e) for e in node.elts]
+        raise ValueError("Unsupported expression '{}'".format(where))
+
+    return convert(tree.body)
+
+
+def read_csv(datafile, columns, dtype):
+    try:
+        with open_datafile(datafile) as f:
+            return pd.read_table(f, sep=",", comment="#", usecols=columns, dtype=dtype)
+    except ValueError:
+        if not dtype:
+            raise
+        # Some column is not numeric after all, let pandas infer the types
+        with open_datafile(datafile) as f:
+            return pd.read_table(f, sep=",", comment="#", usecols=columns)
+
+
+# Chunks of chunksize rows of the CSV file opened by open_source()
+# As in read_csv, if some column is not numeric after all, the file is read again letting pandas infer the types,
+# from the chunk that failed on
+def read_csv_chunks(open_source, columns, dtype, chunksize):
+    read = lambda f, dtype: pd.read_table(f, sep=",", comment="#", usecols=columns, dtype=dtype, chunksize=chunksize)
+    done = 0
+    try:
+        with open_source() as f:
+            for chunk in read(f, dtype):
+                yield chunk
+                done += 1
+    except ValueError:
+        if not dtype:
+            raise
+        with open_source() as f:
+            yield from it.islice(read(f, None), done, None)
+
+
+# Parquet and Arrow files are memory-mapped and their columns are read only if used
+# Their types are stored in the file, so dtype is not needed
+def read_parquet(datafile, columns, dtype):
+    import pyarrow.parquet as pq
+    return pq.read_table(datafile, columns=columns, memory_map=True).to_pandas(split_blocks=True)
+
+
+def read_arrow(datafile, columns, dtype):
+    import pyarrow.feather as feather
+    return feather.read_table(datafile, columns=columns, memory_map=True).to_pandas(split_blocks=True)
+
+
+# Columns of a memory-mapped .npy file: the fields of a structured array or the columns of a 1D/2D array, named by position
+def npy_columns(data):
+    if data.dtype.names:
+        return {name: data[name] for name in data.dtype.names}
+    data = data.reshape(len(data), -1)
+    return {str(c): data[:, c] for c in range(data.shape[1])}
+
+
+def read_npy(datafile, columns, dtype):
+    arrays = npy_columns(np.load(datafile, mmap_mode="r"))
+    if columns != None:
+        arrays = {name: arrays[name] for name in columns}
+    return pd.DataFrame(arrays, copy=False)
+
+
+# Each array of a .npz file is a column, only the used ones are loaded
+def read_npz(datafile, columns, dtype):
+    with np.load(datafile) as data:
+        if columns == None:
+            columns = data.files
+        return pd.DataFrame({name: data[name] for name in columns}, copy=False)
+
+
+# SQL query that gives the data of a plot from a SQLite database: either query or the rows of table, filtered by where
+def sql_query(query=None, table=None, where=None):
+    assert query or table, colored("Plots from SQLite databases need a query or a table", "red")
+    if not query:
+        query = 'SELECT * FROM "{}"'.format(table.replace('"', '""'))
+    if where:
+        query = "SELECT * FROM ({}) WHERE {}".format(query, where)
+    return query
+
+
+# Key that identifies the data of a plot: the datafile (a tuple for a list of datafiles) and, if any, the SQL query or
+# pandas query expression that selects its rows (see data_rows), the column with the datafile of each row and the
+# bound of the rows (see data_bound)
+def data_source(datafile, rows=None, source_column=None, bound=None):
+    key = [datafile_key(datafile)]
+    if rows != None or source_column != None or bound != None:
+        key.append(rows)
+    if source_column != None or bound != None:
+        key.append(source_column)
+    if bound != None:
+        key.append(bound)
+    return tuple(key) if len(key) > 1 else key[0]
+
+
+# Key that identifies the columns of a plot: the same for all the plots of a datafile, or of a query for SQLite databases
+def header_source(datafile, query=None, table=None, where=None, source_column=None):
+    sql = sql_query(query, table, where) if datafile_format(datafile) == "sqlite" else None
+    return data_source(datafile, sql, source_column)
+
+
+# Rows of the data of a plot: the SQL query that gives them for SQLite databases, or the pandas query expression (where)
+# that they satisfy for other datafiles, None if all of them are used
+# For SQLite databases, if bound (a column name) is given, the rows where it is out of [xmin, xmax] are filtered out
+# too, but for the closest ones below xmin and above xmax, so lines reach the edges of the plot. For other datafiles
+# the rows are bounded while they are read, see data_bound
+def data_rows(datafile, query=None, table=None, where=None, bound=None, xmin=None, xmax=None):
+    if datafile_format(datafile) != "sqlite":
+        return where
+
+    sql = sql_query(query, table, where)
+    if bound != None:
+        name = '"{}"'.format(bound.replace('"', '""'))
+        conditions = []
+        if xmin != None:
+            conditions.append("{0} >= COALESCE((SELECT MAX({0}) FROM ({1}) WHERE {0} < {2!r}), {2!r})".format(name, sql, float(xmin)))
+        if xmax != None:
+            conditions.append("{0} <= COALESCE((SELECT MIN({0}) FROM ({1}) WHERE {0} > {2!r}), {2!r})".format(name, sql, float(xmax)))
+        if conditions:
+            sql = sql_query(sql, where=" AND ".join(conditions))
+    return sql
+
+
+# Bound of the rows of a plot read from datafiles other than SQLite databases, (column, xmin, xmax), see bounded_chunks
+def data_bound(datafile, bound=None, xmin=None, xmax=None):
+    if bound == None or datafile_format(datafile) == "sqlite":
+        return None
+    return (bound, None if xmin == None else float(xmin), None if xmax == None else float(xmax))
+
+
+# Chunks of the rows where column is in [xmin, xmax], and the rows right before and after them (in the order of the
+# chunks), so lines reach the edges of the plot
+def bounded_chunks(chunks, column, xmin=None, xmax=None):
+    last = None # Last row of the previous chunk, if it was not kept
+    last_inside = False
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        x = chunk[column].values
+        inside = np.ones(len(x), dtype=bool)
+        if xmin != None:
+            inside &= x >= xmin
+        if xmax != None:
+            inside &= x <= xmax
+        keep = inside.copy()
+        keep[1:] |= inside[:-1]
+        keep[:-1] |= inside[1:]
+        keep[0] |= last_inside
+        selected = chunk[keep]
+        if last is not None and inside[0]:
+            selected = pd.concat([last, selected])
+        if len(selected):
+            yield selected
+        last = None if keep[-1] else chunk.iloc[-1:]
+        last_inside = inside[-1]
+
+
+# pyarrow expression of the rows between the closest values of column below xmin and above xmax (or xmin and xmax if
+# there are none) among the rows of dataset that satisfy expression
+def arrow_bound(dataset, expression, column, xmin=None, xmax=None):
+    import pyarrow.compute as pc
+    field = pc.field(column)
+    for limit, outside, closest, within in [(xmin, operator.lt, pc.max, operator.ge), (xmax, operator.gt, pc.min, operator.le)]:
+        if limit != None:
+            values = dataset.to_table(columns=[column], filter=expression & outside(field, limit))[column]
+            value = closest(values).as_py() if len(values) else None
+            expression = expression & within(field, limit if value == None else value)
+    return expression
+
+
+def connect_sqlite(datafile):
+    # Read only, so a missing database is an error instead of a new empty database
+    uri = "file:{}?mode=ro".format(urllib.request.pathname2url(osp.abspath(datafile)))
+    return sqlite3.connect(uri, uri=True)
+
+
+# Only the used columns of the result of the query are fetched, the filtering and aggregation are done by SQLite
+def select_columns(query, columns):
+    if columns == None:
+        return query
+    return "SELECT {} FROM ({})".format(", ".join('"{}"'.format(c.replace('"', '""')) for c in columns), query)
+
+
+def read_sqlite(datafile, columns, dtype, query):
+    with contextlib.closing(connect_sqlite(datafile)) as con:
+        return pd.read_sql_query(select_columns(query, columns), con, dtype=dtype)
+
+
+readers = {"csv": read_csv, "parquet": read_parquet, "arrow": read_arrow, "npy": read_npy, "npz": read_npz}
+
+
+# If the values of column in a CSV file never decrease, checked on every line (missing values are ignored)
+def csv_sorted(datafile, column, chunksize=10**6):
+    last = -np.inf
+    for chunk in pd.read_table(datafile, sep=",", comment="#", usecols=[column], dtype={column: np.float64}, chunksize=chunksize):
+        values = chunk[column].values
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            continue
+        if values[0] < last or (np.diff(values) < 0).any():
+            return False
+        last = values[-1]
+    return True
+
+
+# Sidecar index of a CSV file sorted by column: the values of column and the byte offsets of one of every step lines
+# The values are empty if the file is not sorted by column
+# It is stored in <datafile>.sidx and built again when the datafile changes
+def sidecar_index(datafile, column, step=1000):
+    path = datafile + ".sidx"
+    st = os.stat(datafile)
+    meta = [str(st.st_size), str(st.st_mtime_ns), column, str(step)]
     try:
-        df = pd.read_table(datafile, sep=",", comment="#")
+        with np.load(path) as sidx:
+            if list(sidx["meta"]) == meta:
+                return sidx["values"], sidx["offsets"], bytes(sidx["header"])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    values = []
+    offsets = []
+    with open(datafile, "rb") as f:
+        # Comments and blank lines before the header are skipped, as pandas does
+        header = f.readline()
+        while header and (not header.strip() or header.lstrip().startswith(b"#")):
+            header = f.readline()
+        pos = f.tell()
+        position = [c.strip().strip(b'"').decode() for c in header.rstrip(b"\r\n").split(b",")].index(column)
+        line = 0
+        carry = b""
+        while True:
+            block = f.read(2**24)
+            if not block:
+                break
+            buf = carry + block
+            base = pos - len(carry)
+            ends = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == ord("\n"))
+            starts = np.r_[0, ends[:-1] + 1]
+            # Sample the complete lines of the block, the last one may continue in the next block
+            for i in np.flatnonzero((line + np.arange(len(ends))) % step == 0):
+                try:
+                    values.append(float(buf[starts[i]:ends[i]].split(b",")[position]))
+                    offsets.append(base + starts[i])
+                except (ValueError, IndexError):
+                    pass # Comments, blank lines...
+            line += len(ends)
+            carry = buf[ends[-1] + 1:] if len(ends) else buf
+            pos += len(block)
+
+    values = np.array(values, dtype=np.float64)
+    offsets = np.array(offsets, dtype=np.int64)
+    # The samples can be sorted while the lines between them are not
+    if np.any(np.diff(values) < 0) or not csv_sorted(datafile, column):
+        values, offsets = values[:0], offsets[:0]
+    try:
+        with open(path, "wb") as f:
+            np.savez(f, meta=np.array(meta), values=values, offsets=offsets, header=np.frombuffer(header, dtype=np.uint8))
+    except OSError:
+        pass # Read-only directory, the index is used only this time
+    return values, offsets, header
+
+
+# The header and the lines of a CSV file sorted by column that may have values between xmin and xmax, found with its sidecar index
+# None if the file is not sorted
+def csv_range(datafile, column, xmin, xmax):
+    values, offsets, header = sidecar_index(datafile, column)
+    if len(values) == 0:
+        return None
+    start = 0
+    if xmin != None:
+        start = offsets[max(np.searchsorted(values, xmin, side="left") - 1, 0)]
+    with open(datafile, "rb") as f:
+        f.seek(start)
+        # Up to the second sample above xmax, so the line after the last one in range is read too
+        end = np.searchsorted(values, xmax, side="right") + 1 if xmax != None else len(values)
+        if end < len(values):
+            return io.BytesIO(header + f.read(offsets[end] - start))
+        return io.BytesIO(header + f.read())
+
+
+# Read a datafile and transform it to a pandas dataframe
+# If columns (list of names) is given, only those columns are read, and dtype (dict name -> type) avoids type inference
+# SQLite databases need the query that gives the data, see sql_query
+# For other datafiles, where (a pandas query expression) and bound (see data_bound) filter the rows as they are read,
+# see read_chunks
+# Several datafiles (a list or a glob pattern) are read in parallel and concatenated, see concat_datafiles
+def read_data(datafile, columns=None, dtype=None, query=None, where=None, seek=None, source_column=None, bound=None):
+    if multiple_datafiles(datafile):
+        return concat_datafiles(datafile, lambda f, columns, dtype: read_data(f, columns, dtype, query, where, seek, bound=bound), columns, dtype, source_column)
+    try:
+        fmt = datafile_format(datafile)
+        if fmt == "sqlite":
+            df = read_sqlite(datafile, columns, dtype, query)
+        elif where or bound:
+            df = pd.concat(list(read_chunks(datafile, columns, dtype, where=where, seek=seek, bound=bound)), ignore_index=True)
+        else:
+            df = readers[fmt](datafile, columns, dtype)
     except:
         traceback.print_exc()
         print(colored("Error: Reading '{}'".format(datafile), "red"), file=sys.stderr)
         sys.exit(1)
+    if where or bound:
+        assert len(df.index) > 0, colored("No rows of '{}' satisfy '{}'".format(datafile, where or bound), "red")
     assert len(df.index) > 0, colored("The datafile '{}' is empty".format(datafile), "red")
     return df
 
 
+# Read a datafile in dataframes of (about) chunksize rows
+# CSV files are parsed chunk by chunk, Parquet files are read by batches and the rest are memory-mapped and sliced
+# Only the rows that satisfy where (a pandas query expression) are kept, chunk by chunk, so the rest are never
+# kept in memory; Parquet and Arrow files skip them while reading, if pyarrow can express the filter
+# Rows out of bound are dropped too, see bounded_chunks, and Parquet and Arrow files skip them while reading, see arrow_bound
+# CSV files sorted by a column can be read only between two values of it, seek being (column, xmin, xmax), see csv_range
+# The chunks of several datafiles (a list or a glob pattern) are read one datafile after another
+def read_chunks(datafile, columns=None, dtype=None, chunksize=10**6, query=None, where=None, seek=None, bound=None):
+    if multiple_datafiles(datafile):
+        return it.chain.from_iterable(read_chunks(f, columns, dtype, chunksize, query, where, seek, bound) for f in datafiles(datafile))
+    fmt = datafile_format(datafile)
+    if fmt == "sqlite":
+        where = None # Already part of the query
+
+    # Columns needed to filter the rows, but not to plot
+    extra = []
+    if where and columns != None:
+        extra = [c for c in read_header(datafile) if c in expression_columns(where) and c not in columns]
+    filtered = lambda chunk: chunk.query(where)[columns] if columns != None else chunk.query(where)
+
+    try:
+        expression = None
+        if fmt in ["parquet", "arrow"] and (where or bound):
+            import pyarrow.compute as pc
+            import pyarrow.dataset as ds
+            dataset = ds.dataset(datafile, format="parquet" if fmt == "parquet" else "ipc")
+            try:
+                expression = arrow_filter(where) if where else pc.scalar(True)
+            except (ValueError, SyntaxError):
+                expression = None
+            if expression is not None and bound:
+                expression = arrow_bound(dataset, expression, *bound)
+        if fmt == "csv" and datafile_compression(datafile):
+            chunks = read_csv_chunks(lambda: open_datafile(datafile), columns and columns + extra, dtype, chunksize)
+        elif fmt == "csv":
+            source = datafile
+            if seek:
+                source = csv_range(datafile, *seek) or datafile
+            def open_source():
+                if not isinstance(source, str):
+                    source.seek(0) # The lines read by csv_range, read again if retrying
+                return contextlib.nullcontext(source)
+            chunks = read_csv_chunks(open_source, columns and columns + extra, dtype, chunksize)
+        elif fmt == "sqlite":
+            def sql_chunks():
+                with contextlib.closing(connect_sqlite(datafile)) as con:
+                    yield from pd.read_sql_query(select_columns(query, columns), con, dtype=dtype, chunksize=chunksize)
+            chunks = sql_chunks()
+        elif expression is not None:
+            batches = dataset.to_batches(columns=columns, filter=expression, batch_size=chunksize)
+            chunks = (batch.to_pandas() for batch in batches)
+            where = bound = None # Already filtered
+        elif fmt == "parquet":
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(datafile, memory_map=True).iter_batches(batch_size=chunksize, columns=columns and columns + extra)
+            chunks = (batch.to_pandas() for batch in batches)
+        else:
+            df = readers[fmt](datafile, columns and columns + extra, dtype)
+            chunks = (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+    except:
+        traceback.print_exc()
+        print(colored("Error: Reading '{}'".format(datafile), "red"), file=sys.stderr)
+        sys.exit(1)
+
+    if where:
+        chunks = (filtered(chunk) for chunk in chunks)
+    if bound:
+        chunks = bounded_chunks(chunks, *bound)
+    return chunks
+
+
+# Read a datafile in chunks of chunksize rows and reduce each chunk into bins of the index column as it goes,
+# so the memory used depends on the number of bins and not on the size of the file
+# The bins are either binwidth units wide or, if bins is given, that many between xmin and xmax
+# Each bin gets the mean, min, max or last value (agg) of each column and is placed at its center
+def read_binned_data(datafile, index, columns, binwidth=None, bins=None, agg="mean", xmin=None, xmax=None, chunksize=10**6, query=None, where=None, seek=None, bound=None):
+    assert agg in ["mean", "min", "max", "last"], colored("Valid bin aggregations are 'mean', 'min', 'max' and 'last', not '{}'".format(agg), "red")
+    assert binwidth or bins, colored("Either a bin width or a number of bins is needed", "red")
+    dtype = {name: np.float64 for name in [index] + columns}
+
+    def chunks(columns):
+        return read_chunks(datafile, columns, dtype, chunksize, query, where, seek, bound)
+
+    # The range of the index is needed to know the width of the bins
+    if not binwidth:
+        if xmin == None or xmax == None:
+            lo, hi = np.inf, -np.inf
+            for chunk in chunks([index]):
+                lo = min(lo, chunk[index].min())
+                hi = max(hi, chunk[index].max())
+            xmin = lo if xmin == None else xmin
+            xmax = hi if xmax == None else xmax
+        binwidth = (xmax - xmin) / bins
+        if binwidth <= 0:
+            binwidth = 1
+    origin = xmin if xmin != None else 0
+
+    # Partial results per bin, merged chunk by chunk
+    stats = {"mean": ["sum", "count"], "min": ["min"], "max": ["max"], "last": ["last"]}[agg]
+    merge = {"sum": "sum", "count": "sum", "min": "min", "max": "max", "last": "last"}
+    acc = dict.fromkeys(stats)
+
+    for chunk in chunks([index] + columns):
+        x = chunk[index].values
+        keep = ~np.isnan(x)
+        if xmin != None:
+            keep &= x >= xmin
+        if xmax != None:
+            keep &= x <= xmax
+        b = np.floor((x - origin) / binwidth)
+        if bins:
+            b = np.minimum(b, bins - 1) # xmax belongs to the last bin
+        groups = chunk.loc[keep, columns].groupby(b[keep].astype(np.int64))
+        for stat in stats:
+            part = getattr(groups, stat)()
+            if acc[stat] is not None:
+                part = pd.concat([acc[stat], part]).groupby(level=0).agg(merge[stat])
+            acc[stat] = part
+
+    assert acc[stats[0]] is not None and len(acc[stats[0]]) > 0, colored("No data to bin in '{}'".format(datafile), "red")
+    if agg == "mean":
+        df = acc["sum"] / acc["count"]
+    else:
+        df = acc[agg]
+
+    df.insert(0, index, origin + (df.index.values + 0.5) * binwidth)
+    return df.reset_index(drop=True)
+
+
+# Indexes of the points of a series (sorted by x) to keep to draw it with about the given number of points
+# The x range is split into points / 2 slices and the minimum and the maximum of each slice are kept,
+# so the extremes are preserved, and slices with only NaNs keep a NaN, so gaps are preserved too
+def decimate_minmax(x, y, points):
+    n = len(y)
+    nbins = max(points // 2, 1)
+    if n <= points or not np.all(np.diff(x) >= 0):
+        return np.arange(n)
+
+    span = x[-1] - x[0]
+    if span > 0:
+        bins = np.minimum(((x - x[0]) / span * nbins).astype(np.int64), nbins - 1)
+    else:
+        bins = np.arange(n) * nbins // n
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    slices = np.repeat(np.arange(len(starts)), lengths)
+
+    def first_of_each_slice(values, reduce):
+        best = np.repeat(reduce.reduceat(values, starts), lengths)
+        candidates = np.flatnonzero(values == best)
+        s = slices[candidates]
+        return candidates[np.r_[True, s[1:] != s[:-1]]]
+
+    nan = np.isnan(y)
+    lows = first_of_each_slice(np.where(nan, np.inf, y), np.minimum)
+    highs = first_of_each_slice(np.where(nan, -np.inf, y), np.maximum)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+# Indexes of the points of a series (sorted by x) to keep to draw it with the given number of points,
+# using the Largest-Triangle-Three-Buckets algorithm plus the minimum and the maximum
+# Runs of NaNs split the series into segments that are decimated on their own, keeping a NaN between them
+def decimate_lttb(x, y, points):
+    n = len(y)
+    if n <= points or points < 3 or not np.all(np.diff(x) >= 0):
+        return np.arange(n)
+
+    nan = np.isnan(y)
+    if nan.any():
+        edges = np.flatnonzero(np.diff(np.r_[False, ~nan, False]))
+        starts, ends = edges[::2], edges[1::2]
+        if len(starts) > points // 4:
+            return decimate_minmax(x, y, points)
+        valid = ends - starts
+        keep = [np.flatnonzero(nan)[:1]]
+        for start, end, length in zip(starts, ends, valid):
+            segment = start + decimate_lttb(x[start:end], y[start:end], max(3, points * length // valid.sum()))
+            keep += [segment, [end] if end < n else []]
+        return np.unique(np.concatenate(keep).astype(np.int64))
+
+    # The first and last points are always kept, the rest are split into points - 2 buckets
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    xavg = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    yavg = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    xavg = np.r_[xavg[1:], x[-1]]
+    yavg = np.r_[yavg[1:], y[-1]]
+
+    keep = np.empty(points, dtype=np.int64)
+    keep[0] = a = 0
+    keep[-1] = n - 1
+    for b, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        # Point of the bucket that makes the largest triangle with the last kept point and the average of the next bucket
+        area = np.abs((x[a] - xavg[b]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (yavg[b] - y[a]))
+        a = lo + np.argmax(area)
+        keep[b + 1] = a
+
+    # The extremes are kept too
+    return np.unique(np.r_[keep, np.argmin(y), np.argmax(y)])
+
+
+# Read only the names of the columns of a datafile (or of the result of the query, for SQLite databases)
+# Several datafiles (a list or a glob pattern) must have the same columns, the ones of the first of them
+def read_header(datafile, query=None):
+    datafile = datafiles(datafile)[0]
+    try:
+        fmt = datafile_format(datafile)
+        if fmt == "sqlite":
+            with contextlib.closing(connect_sqlite(datafile)) as con:
+                cursor = con.execute("SELECT * FROM ({}) LIMIT 0".format(query))
+                return [d[0] for d in cursor.description]
+        elif fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_schema(datafile, memory_map=True).names
+        elif fmt == "arrow":
+            import pyarrow as pa
+            with pa.memory_map(datafile) as source:
+                return pa.ipc.open_file(source).schema.names
+        elif fmt == "npy":
+            return list(npy_columns(np.load(datafile, mmap_mode="r")))
+        elif fmt == "npz":
+            with np.load(datafile) as data:
+                return list(data.files)
+        with open_datafile(datafile) as f:
+            df = pd.read_table(f, sep=",", comment="#", nrows=0)
+    except:
+        traceback.print_exc()
+        print(colored("Error: Reading '{}'".format(datafile), "red"), file=sys.stderr)
+        sys.exit(1)
+    return list(df.columns)
+
+
+# Columns (positions) used by a plot, mapped to True if they hold values and False if they are part of the index
+# or of the keys that group the rows to aggregate them (by, see aggregate_keys)
+def used_columns(header, index, cols, ecols, by=None):
+    if not isinstance(index, list):
+        index = [index]
+    index = [i for i in index if i != None] + [i for i in by or [] if i not in index]
+    # If no cols are specified, all but the index are used
+    if not cols:
+        cols = [i for i in range(len(header)) if i not in index]
+    used = {col: True for col in list(cols) + list(ecols)}
+    used.update({i: False for i in index})
+    return used
+
+
+# Columns (positions) that group the rows of a plot to aggregate them: the "by" of aggregate, the index by default
+def aggregate_keys(aggregate, index):
+    if not aggregate:
+        return []
+    by = aggregate.get("by")
+    if by == None:
+        by = index
+    return list(by) if isinstance(by, list) else [by]
+
+
+# Statistic (stat, "mean" or "median") of the values of each column of each group of rows with the same values of the
+# columns by, and its error: the standard deviation ("std"), standard error of the mean ("sem"), the percentiles of the
+# values ("percentile") or the percentiles of the statistic over resamples of the values ("bootstrap"), or None
+# The result has the columns by, the statistic of each column with its name, and the errors after it: "<column> <error>"
+# for std and sem, and "<column> lower" and "<column> upper" for percentiles, as distances to the statistic
+def aggregate_data(df, by, columns, stat="mean", error=None, percentiles=(2.5, 97.5), resamples=1000, seed=0):
+    assert stat in ["mean", "median"], colored("Valid aggregate statistics are 'mean' and 'median', not '{}'".format(stat), "red")
+    assert error in [None, "std", "sem", "percentile", "bootstrap"], \
+            colored("Valid aggregate errors are 'std', 'sem', 'percentile' and 'bootstrap', not '{}'".format(error), "red")
+    assert len(percentiles) == 2, colored("Two percentiles are needed, the lower and the upper, not {}".format(percentiles), "red")
+
+    groups = df.groupby(by, sort=True, observed=True)[columns]
+    values = groups.mean() if stat == "mean" else groups.median()
+    if error == None:
+        return values.reset_index()
+
+    if error in ["std", "sem"]:
+        errors = [getattr(groups, error)().rename(columns=lambda col: "{} {}".format(col, error))]
+    else:
+        if error == "percentile":
+            lower, upper = (groups.quantile(p / 100) for p in percentiles)
+        else:
+            codes = groups.ngroup().values.astype(np.float64)
+            rows = codes >= 0 # Not the rows with a missing key, which are in no group
+            codes = codes[rows].astype(np.int64)
+            rng = np.random.default_rng(seed)
+            intervals = {col: bootstrap(df[col].values[rows].astype(np.float64), codes, len(values), stat, percentiles, resamples, rng) for col in columns}
+            lower = pd.DataFrame({col: interval[0] for col, interval in intervals.items()}, index=values.index)
+            upper = pd.DataFrame({col: interval[1] for col, interval in intervals.items()}, index=values.index)
+        errors = [(values - lower).rename(columns=lambda col: col + " lower"), (upper - values).rename(columns=lambda col: col + " upper")]
+
+    df = pd.concat([values] + errors, axis=1)
+    order = [name for col in columns for name in [col] + [e.columns[columns.index(col)] for e in errors]]
+    return df[order].reset_index()
+
+
+# Percentiles of the bootstrap distribution of the mean or median (stat) of each group of values, as an array
+# (len(percentiles), groups), codes telling the group of each value
+# The groups with the same number of values share the indexes of their resamples, which are drawn at once: the means
+# of the resamples are then products of matrices, values by number of times each value is drawn, and the medians are
+# computed on the resampled values; both in batches of groups of about batch values
+def bootstrap(values, codes, groups, stat, percentiles, resamples=1000, rng=None, batch=2**22):
+    rng = rng or np.random.default_rng()
+    order = np.argsort(codes, kind="stable")
+    values = values[order]
+    sizes = np.bincount(codes, minlength=groups)
+    starts = np.cumsum(sizes) - sizes
+
+    result = np.full((len(percentiles), groups), np.nan)
+    for n in np.unique(sizes[sizes > 0]):
+        same = np.flatnonzero(sizes == n)
+        matrix = values[starts[same, None] + np.arange(n)] # One row per group
+        missing = np.isnan(matrix)
+        if stat == "mean":
+            # Missing values are not counted, as in nanmean
+            filled, drawn = np.where(missing, 0, matrix), (~missing).astype(np.float64)
+        else:
+            median = np.nanmedian if missing.any() else np.median
+
+        # The resamples are drawn in chunks of about batch values, and the groups taken in batches of about batch
+        # estimates (or drawn values, for the median), so the memory does not grow with the resamples times the size
+        chunk = max(1, min(resamples, batch // n)) # Resamples per chunk
+        step = max(1, batch // (resamples if stat == "mean" else chunk * n)) # Groups per batch
+        for g in range(0, len(same), step):
+            estimates = np.empty((len(same[g:g + step]), resamples))
+            for r in range(0, resamples, chunk):
+                k = min(chunk, resamples - r)
+                draws = rng.integers(0, n, size=(k, n))
+                if stat == "mean":
+                    counts = np.bincount((draws + n * np.arange(k)[:, None]).ravel(), minlength=k * n).reshape(k, n).T.astype(np.float64)
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        estimates[:, r:r + k] = filled[g:g + step] @ counts / (drawn[g:g + step] @ counts)
+                else:
+                    estimates[:, r:r + k] = median(matrix[g:g + step, draws], axis=2)
+            quantiles = np.nanpercentile if np.isnan(estimates).any() else np.percentile
+            result[:, same[g:g + step]] = quantiles(estimates, percentiles, axis=1)
+    return result
+
+
+# Transformations of the data of a plot, applied in order to the value columns (columns) of df, already indexed
+# Each one is either a name or {name: argument}, the argument being its main parameter or a dictionary of parameters:
+# - rolling: window, stat ("mean" or "median"), center, min_periods; the statistic of a rolling window of rows
+# - ewm: span, or alpha, halflife or com; exponentially weighted mean
+# - diff: periods; difference with the previous row, e.g. to get the deltas of a cumulative counter
+# - cumsum: cumulative sum
+# - divide: column; value divided by the value of another column (a name), e.g. to normalize to a baseline
+# - speedup: column; value of another column (a name) divided by the value, e.g. the speedup of times over a baseline
+# - resample: rule, stat ("mean", "median", "min", "max", "sum" or "last"); statistic of the rows of each interval of
+#   the index, given as a pandas offset (e.g. "10s") for time indexes or as a number for numeric indexes
+def transform_data(df, columns, transforms):
+    defaults = {"rolling": "window", "ewm": "span", "diff": "periods", "cumsum": None, "divide": "column", "speedup": "column", "resample": "rule"}
+    result = df[columns]
+    for transform in transforms:
+        name, args = next(iter(transform.items())) if isinstance(transform, dict) else (transform, None)
+        assert name in defaults, colored("'{}' is not a valid transform, valid transforms are {}".format(name, list(defaults)), "red")
+        if isinstance(args, dict):
+            args = dict(args)
+        else:
+            args = {defaults[name]: args} if args != None else {}
+
+        if name == "rolling":
+            stat = args.pop("stat", "mean")
+            assert stat in ["mean", "median"], colored("Valid rolling statistics are 'mean' and 'median', not '{}'".format(stat), "red")
+            result = getattr(result.rolling(**args), stat)()
+        elif name == "ewm":
+            result = result.ewm(**args).mean()
+        elif name == "diff":
+            result = result.diff(**args)
+        elif name == "cumsum":
+            result = result.cumsum()
+        elif name in ["divide", "speedup"]:
+            baseline = df[args["column"]].values[:, None]
+            result = result / baseline if name == "divide" else baseline / result
+        else:
+            stat = args.get("stat", "mean")
+            assert stat in ["mean", "median", "min", "max", "sum", "last"], colored("'{}' is not a valid resample statistic".format(stat), "red")
+            assert result.index.nlevels == 1, colored("Only data with a single index column can be resampled", "red")
+            if isinstance(result.index, (pd.DatetimeIndex, pd.TimedeltaIndex, pd.PeriodIndex)):
+                groups = result.resample(args["rule"])
+            else:
+                step = float(args["rule"])
+                groups = result.groupby(np.floor(result.index.values / step) * step)
+            result = getattr(groups, stat)()
+            result.index.name = df.index.name
+    return result
+
+
+# Columns (names) that the transforms of a plot need besides its value columns, see transform_data
+def transform_columns(transforms):
+    columns = []
+    for transform in transforms or []:
+        if isinstance(transform, dict):
+            name, args = next(iter(transform.items()))
+            if name in ["divide", "speedup"]:
+                columns.append(args["column"] if isinstance(args, dict) else args)
+    return columns
+
+
+# Column to filter by xmin and xmax: the index, if there is only one and there are limits
+def bound_column(header, index, xmin, xmax, dates=False):
+    if isinstance(index, list) and len(index) == 1:
+        index = index[0]
+    # Dates are compared once parsed (see parse_dates), so they do not filter the rows read
+    if (xmin == None and xmax == None) or not isinstance(index, int) or dates:
+        return None
+    return header[index]
+
+
+# Widths of the fields of a strftime format made only of %Y, %m, %d, %H, %M, %S and literal characters, in order, as
+# (field, width) with the bytes of the character as the field of the literals, or None for other formats
+def fixed_width_fields(format):
+    widths = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+    fields = []
+    i = 0
+    while i < len(format):
+        if format[i] == "%":
+            if format[i + 1:i + 2] not in widths:
+                return None
+            fields.append((format[i + 1], widths[format[i + 1]]))
+            i += 2
+        else:
+            fields.append((format[i].encode(), len(format[i].encode())))
+            i += 1
+    return fields
+
+
+# Characters of strings that all have the same width, as an (N, width) array of bytes, taken from the buffers of the
+# Arrow array of the strings without converting them one by one, or None if they can not be taken
+def fixed_width_chars(values, width):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    try:
+        array = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if array.type not in [pa.string(), pa.large_string()] or array.null_count or len(array) == 0:
+        return None
+    _, offsets, data = array.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64 if array.type == pa.large_string() else np.int32)[array.offset:array.offset + len(array) + 1]
+    if (np.diff(offsets) != width).any():
+        return None
+    return np.frombuffer(data, dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(len(array), width)
+
+
+# Dates of the characters of fixed-width strings (see fixed_width_chars) with the fields of their format, computed with
+# integer arithmetic on the digits, or None if some string does not match the format or is not a valid date
+# The strings are parsed by blocks of rows that fit in the CPU caches, see fixed_width_seconds
+def parse_fixed_width(chars, fields, rows=2**16):
+    seconds = np.empty(len(chars), dtype=np.int64)
+    for start in range(0, len(chars), rows):
+        block = fixed_width_seconds(chars[start:start + rows], fields)
+        if block is None:
+            return None
+        seconds[start:start + rows] = block
+    seconds *= 10**9
+    return pd.DatetimeIndex(seconds.view("datetime64[ns]"))
+
+
+# Seconds since the epoch of the characters of fixed-width strings, or None if some string is not valid
+def fixed_width_seconds(chars, fields):
+    # Each field is copied once to contiguous rows of its characters, which are either digits or the literal of the format
+    # The numbers of the fields are kept in the narrowest type that fits them
+    numbers = {"Y": 1900, "m": 1, "d": 1, "H": 0, "M": 0, "S": 0} # As strptime
+    start = 0
+    for field, width in fields:
+        block = np.ascontiguousarray(chars[:, start:start + width].T)
+        if field not in numbers:
+            if (block != np.frombuffer(field, dtype=np.uint8)[:, None]).any():
+                return None
+        else:
+            digits = block - np.uint8(ord("0"))
+            if (digits > 9).any(): # Characters below "0" wrap around
+                return None
+            number = digits[0].astype(np.uint8 if width <= 2 else np.uint16 if width <= 4 else np.int64)
+            for row in digits[1:]:
+                number = number * 10 + row
+            numbers[field] = number
+        start += width
+
+    # Day of the epoch at which each month starts and its length, for the months between the first and the last
+    year, month, day, hour, minute, second = (numbers[field] for field in "YmdHMS")
+    if np.any((month < 1) | (month > 12) | (hour > 23) | (minute > 59) | (second > 59)):
+        return None
+    months = np.asarray(year, dtype=np.int32) * 12 + (np.asarray(month, dtype=np.int32) - 1)
+    first = months.min()
+    starts = (np.arange(first, months.max() + 2) - 1970 * 12).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    months = months - first
+    if np.any((day < 1) | (day > np.diff(starts)[months])):
+        return None
+
+    clock = np.asarray(hour, dtype=np.int32) * 3600 + np.asarray(minute, dtype=np.int32) * 60 + second
+    return (starts[months] + (np.asarray(day, dtype=np.int32) - 1)) * 86400 + clock
+
+
+# Dates of a column: seconds (or other unit, e.g. "ms") since the epoch, or strings with a strftime format (or "ISO8601")
+# Fixed-width formats of %Y, %m, %d, %H, %M and %S are parsed from the bytes of the strings, the others by pandas
+def parse_dates(values, format=None, unit=None):
+    if unit:
+        return pd.to_datetime(pd.to_numeric(values), unit=unit)
+    fields = fixed_width_fields(format) if format else None
+    if fields:
+        chars = fixed_width_chars(values, sum(width for _, width in fields))
+        if chars is not None:
+            dates = parse_fixed_width(chars, fields)
+            if dates is not None:
+                return pd.Series(dates, index=values.index, name=values.name) if isinstance(values, pd.Series) else dates
+    return pd.to_datetime(values, format=format)
+
+
+# Register the columns of the datafile that a plot (given as a dictionary) is going to use,
+# so the columns shared by several plots are read at once
+def request_columns(desc):
+    if "datafile" not in desc:
+        return
+    datafile, query, table, where, source_column = desc["datafile"], desc.get("query"), desc.get("table"), desc.get("where"), desc.get("source_column")
+    header = Plot.source_header(datafile, query, table, where, source_column)
+    bound = bound_column(header, desc.get("index"), desc.get("xmin"), desc.get("xmax"), bool(desc.get("index_format") or desc.get("index_unit")))
+    rows = data_rows(datafile, query, table, where, bound, desc.get("xmin"), desc.get("xmax"))
+    source = data_source(datafile, rows, source_column, data_bound(datafile, bound, desc.get("xmin"), desc.get("xmax")))
+    ecols = desc.get("ecols", []) + transform_columns(desc.get("transforms"))
+    used = used_columns(header, desc.get("index"), desc.get("cols"), ecols, aggregate_keys(desc.get("aggregate"), desc.get("index")))
+    Plot.register_columns(source, used)
+
+
 def merge_dicts(a, b, path=None):
     "merges b into a"
     if path is None: path = []
@@ -43,6 +1035,391 @@ def merge_dicts(a, b, path=None):
     return a
 
 
+#
+# Cache of parsed datafiles on disk
+#
+
+
+class DiskCache:
+    # Entries are named <path key>-<stat key>-<options key>.<format>, so an entry is fresh as long as the size
+    # and the modification time of the datafile do not change
+    # Several threads (see concat_datafiles and preload_data) and runs may share a cache, so any entry may be removed
+    # by someone else at any time
+
+    def __init__(self, path, size=None):
+        self.path = path
+        self.size = size # Max size of the cache in bytes, None for no limit
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock() # Serializes the changes to the entries made by the threads of this run
+        os.makedirs(path, exist_ok=True)
+
+        # Feather is a fast columnar format, but needs pyarrow
+        try:
+            import pyarrow
+            self.format = "feather"
+        except ImportError:
+            self.format = "pickle"
+
+
+    @staticmethod
+    def digest(obj, length=16):
+        return hashlib.sha1(repr(obj).encode()).hexdigest()[:length]
+
+
+    def entry(self, datafile, options):
+        st = os.stat(datafile)
+        pathkey = DiskCache.digest(osp.abspath(datafile))
+        statkey = DiskCache.digest((st.st_size, st.st_mtime_ns), 8)
+        optkey = DiskCache.digest(options)
+        return pathkey, statkey, osp.join(self.path, "{}-{}-{}.{}".format(pathkey, statkey, optkey, self.format))
+
+
+    def entries(self):
+        paths = glob.glob(osp.join(self.path, "*-*-*.*"))
+        return [p for p in paths if not osp.basename(p).startswith(".")]
+
+
+    # Remove an entry, unless it has already been removed
+    @staticmethod
+    def remove(entry):
+        try:
+            os.remove(entry)
+        except FileNotFoundError:
+            pass
+
+
+    # Only the given columns of the entry are returned (and, with feather, read)
+    def get(self, datafile, options, columns=None):
+        _, _, entry = self.entry(datafile, options)
+        if not osp.exists(entry):
+            self.misses += 1
+            return None
+        try:
+            if self.format == "feather":
+                df = pd.read_feather(entry, columns=columns)
+            else:
+                df = pd.read_pickle(entry)
+                df = df[columns] if columns != None else df
+            os.utime(entry) # Mark as recently used
+        except FileNotFoundError:
+            # Evicted meanwhile
+            self.misses += 1
+            return None
+        except Exception:
+            # Broken entry, e.g. written by an interrupted run
+            DiskCache.remove(entry)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return df
+
+
+    def put(self, datafile, options, df):
+        pathkey, statkey, entry = self.entry(datafile, options)
+
+        # Write to a temporary file of this thread first, so a partial entry is never read
+        tmp = osp.join(self.path, ".{}.{}.{}".format(osp.basename(entry), os.getpid(), threading.get_ident()))
+        if self.format == "feather" and isinstance(df.index, pd.RangeIndex) and df.index.start == 0:
+            df.to_feather(tmp)
+        elif self.format == "feather":
+            df.reset_index(drop=True).to_feather(tmp)
+        else:
+            df.to_pickle(tmp)
+
+        with self.lock:
+            # Entries for older versions of the same datafile are stale
+            for path in self.entries():
+                name = osp.basename(path)
+                if name.startswith(pathkey + "-") and not name.startswith("{}-{}-".format(pathkey, statkey)):
+                    DiskCache.remove(path)
+            os.replace(tmp, entry)
+            self.evict()
+
+
+    # Remove the least recently used entries until the cache fits in its size
+    # Called with the lock held
+    def evict(self):
+        if self.size == None:
+            return
+        entries = []
+        for e in self.entries():
+            try:
+                st = os.stat(e)
+            except FileNotFoundError:
+                continue # Already evicted
+            entries.append((st.st_mtime, st.st_size, e))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, e in entries:
+            if total <= self.size:
+                break
+            total -= size
+            DiskCache.remove(e)
+
+
+#
+# Cache of dataframes in memory
+#
+
+
+class DataFrameCache:
+    # Least recently used frames are evicted when the frames use more than budget bytes
+    # Pinned frames (i.e. used by a plot that has not been plotted yet) are never evicted
+
+    def __init__(self, budget=None):
+        self.budget = budget # Bytes, None for no limit
+        self.frames = collections.OrderedDict()
+        self.sizes = dict()
+        self.pins = collections.Counter()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __contains__(self, key):
+        return key in self.frames
+
+
+    def __len__(self):
+        return len(self.frames)
+
+
+    def __getitem__(self, key):
+        df = self.frames[key]
+        self.frames.move_to_end(key)
+        return df
+
+
+    def get(self, key, default=None):
+        if key not in self.frames:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return self[key]
+
+
+    def __setitem__(self, key, df):
+        if key in self.frames:
+            self.nbytes -= self.sizes[key]
+        self.frames[key] = df
+        self.frames.move_to_end(key)
+        self.sizes[key] = frame_nbytes(df)
+        self.nbytes += self.sizes[key]
+        self.evict()
+
+
+    def __delitem__(self, key):
+        del self.frames[key]
+        self.nbytes -= self.sizes.pop(key)
+
+
+    def clear(self):
+        self.frames.clear()
+        self.sizes.clear()
+        self.pins.clear()
+        self.nbytes = 0
+
+
+    def pin(self, key):
+        self.pins[key] += 1
+
+
+    def unpin(self, key):
+        self.pins[key] -= 1
+        if self.pins[key] <= 0:
+            del self.pins[key]
+        self.evict()
+
+
+    def evict(self):
+        if self.budget == None:
+            return
+        # The most recently used frame is kept, as it is about to be used
+        for key in list(self.frames)[:-1]:
+            if self.nbytes <= self.budget:
+                break
+            if self.pins[key] > 0:
+                continue
+            del self[key]
+            self.evictions += 1
+
+
+    def stats(self):
+        return {"frames": len(self), "bytes": self.nbytes, "pinned": len(+self.pins), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# Same data in less memory: float64 columns become float32 if they differ less than tolerance times the range of the
+# column (far below what a plot can show), integer columns the smallest integer type that holds them, and string
+# columns with repeated values (at most half of them unique) categoricals
+def compact_data(df, tolerance=1e-6):
+    columns = []
+    for name, col in df.items():
+        values = col.values
+        if col.dtype == np.float64:
+            small = values.astype(np.float32)
+            finite = np.isfinite(values)
+            if finite.any():
+                span = np.ptp(values[finite]) or np.abs(values[finite]).max()
+                with np.errstate(invalid="ignore", over="ignore"):
+                    if np.abs(small[finite].astype(np.float64) - values[finite]).max() <= tolerance * span:
+                        col = col.astype(np.float32)
+            else:
+                col = col.astype(np.float32)
+        elif col.dtype.kind in "iu":
+            col = pd.to_numeric(col, downcast="integer" if col.dtype.kind == "i" else "unsigned")
+        elif (col.dtype == object or pd.api.types.is_string_dtype(col.dtype)) and col.nunique() <= len(col) / 2:
+            col = col.astype("category")
+        columns.append(col)
+    return pd.concat(columns, axis=1) if columns else df
+
+
+# Memory used by a frame, in bytes
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# Read a datafile, using the on-disk cache if there is one
+# Each one of several datafiles is cached on its own, so adding a datafile to a glob pattern does not read the rest again
+# The cache holds all the columns of a datafile with their inferred types, so plots of other columns of it hit the same
+# entry, and only the requested columns are loaded from it and converted to dtype
+def cached_read_data(datafile, columns=None, dtype=None, query=None, where=None, seek=None, source_column=None, bound=None):
+    if multiple_datafiles(datafile):
+        return concat_datafiles(datafile, lambda f, columns, dtype: cached_read_data(f, columns, dtype, query, where, seek, bound=bound), columns, dtype, source_column)
+
+    # Only text files are worth caching
+    cache = Plot.diskcache
+    if cache == None or datafile_format(datafile) != "csv":
+        return read_data(datafile, columns, dtype, query, where, seek, bound=bound)
+
+    options = (where,)
+    if bound:
+        options += (bound,)
+    df = cache.get(datafile, options, columns)
+    if df is None:
+        df = read_data(datafile, where=where, seek=seek, bound=bound)
+        cache.put(datafile, options, df)
+        df = df[columns] if columns != None else df
+    try:
+        return df.astype(dtype) if dtype else df
+    except ValueError:
+        return df # Some column is not numeric after all, as in read_csv
+
+
+# Read several datafiles (a list or a glob pattern) in parallel with read(datafile, columns, dtype) and concatenate them
+# once, adding the column source_column (if given) with the datafile of each row
+def concat_datafiles(datafile, read, columns=None, dtype=None, source_column=None):
+    files = datafiles(datafile)
+    if source_column != None:
+        columns = columns and [c for c in columns if c != source_column]
+        dtype = dtype and {c: t for c, t in dtype.items() if c != source_column}
+
+    def read_one(f):
+        df = read(f, columns, dtype)
+        if source_column != None:
+            df[source_column] = f
+        return df
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as pool:
+        dfs = list(pool.map(read_one, files))
+    df = pd.concat(dfs, ignore_index=True)
+    if source_column != None:
+        df[source_column] = df[source_column].astype("category")
+    return df
+
+
+# Read the data of several plots (see Plot.unprepared) with a pool of jobs threads and store it in Plot.dfs
+# Each data source is read only once, even if several plots use it
+def preload_data(plots, jobs):
+    loaders = dict()
+    for obj in plots:
+        key, read = obj.data_loader()
+        # Not evicted until the plot pins it, see Plot.prepare_data
+        Plot.dfs.pin(key)
+        Plot.preloaded[key] += 1
+        if key not in Plot.dfs and key not in loaders:
+            loaders[key] = read
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {key: pool.submit(read) for key, read in loaders.items()}
+        for key, future in futures.items():
+            Plot.dfs[key] = future.result()
+
+
+# Summary of a sample for Axes.bxp: quartiles, mean, whiskers (the furthest values within whis times the interquartile
+# range from the box) and outliers, computed on an array (missing values are ignored) with a single copy of it
+# If there are more than maxfliers outliers, only maxfliers of them are kept, evenly spaced from the lowest to the highest
+def box_stats(values, whis=1.5, maxfliers=None):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)] # Copy, so it can be partially sorted in place
+    q1, med, q3 = np.percentile(values, [25, 50, 75], overwrite_input=True)
+    iqr = q3 - q1
+    low, high = q1 - whis * iqr, q3 + whis * iqr
+    inside = (values >= low) & (values <= high)
+    # Without copying the values inside the whiskers
+    whislo = np.min(values, where=inside, initial=np.inf)
+    whishi = np.max(values, where=inside, initial=-np.inf)
+    fliers = np.sort(values[~inside])
+    if maxfliers != None and len(fliers) > maxfliers:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, maxfliers).round().astype(np.int64)]
+    return {"med": med, "q1": q1, "q3": q3, "iqr": iqr, "mean": values.mean(), "fliers": fliers,
+            "whislo": whislo if np.isfinite(whislo) else q1, "whishi": whishi if np.isfinite(whishi) else q3}
+
+
+# Gaussian kernel density estimate of a sample (missing values are ignored) on points evenly spaced values, from cut
+# bandwidths below its minimum to cut bandwidths above its maximum
+# The sample is linearly binned into the points, and the bins convolved with the kernel using the FFT, which costs
+# O(n + points log points) instead of O(n points)
+# The bandwidth is either a number or a rule: "scott" or "silverman"
+def kde(values, points=512, bandwidth="scott", cut=3):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    assert n > 0, colored("The density of an empty sample can not be estimated", "red")
+
+    if bandwidth == "scott":
+        bw = values.std() * n ** (-1 / 5)
+    elif bandwidth == "silverman":
+        q1, q3 = np.percentile(values, [25, 75])
+        spread = min(values.std(), (q3 - q1) / 1.34) or values.std()
+        bw = 0.9 * spread * n ** (-1 / 5)
+    else:
+        assert isinstance(bandwidth, (int, float)), colored("Valid bandwidths are numbers, 'scott' and 'silverman', not '{}'".format(bandwidth), "red")
+        bw = float(bandwidth)
+    if bw <= 0: # All the values are equal
+        bw = abs(values[0]) * 1e-3 or 1e-3
+
+    grid = np.linspace(values.min() - cut * bw, values.max() + cut * bw, points)
+    delta = grid[1] - grid[0]
+
+    # Linear binning: each value is split between its two closest points
+    pos = (values - grid[0]) / delta
+    left = np.clip(np.floor(pos).astype(np.int64), 0, points - 2)
+    frac = pos - left
+    counts = np.bincount(left, weights=1 - frac, minlength=points) + np.bincount(left + 1, weights=frac, minlength=points)
+
+    offsets = np.arange(-(points - 1), points) * delta
+    kernel = np.exp(-0.5 * (offsets / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+    size = 1 << (3 * points - 3).bit_length()
+    density = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)[points - 1:2 * points - 1]
+    return grid, np.maximum(density, 0) / n # Round-off of the FFT can make some values slightly negative
+
+
+# Means of the blocks of consecutive rows and columns of a 2D array, at most rows x cols blocks (missing values are ignored)
+def block_means(values, rows, cols):
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    sums, counts = np.where(missing, 0, values), (~missing).astype(np.float64)
+    for axis, blocks in [(0, rows), (1, cols)]:
+        if values.shape[axis] > blocks:
+            starts = np.unique(np.linspace(0, values.shape[axis], blocks + 1)[:-1].astype(np.int64))
+            sums = np.add.reduceat(sums, starts, axis=axis)
+            counts = np.add.reduceat(counts, starts, axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
 #
 # Class that describes one plot
 #
@@ -51,7 +1428,24 @@ def merge_dicts(a, b, path=None):
 class Plot:
     kind = "Line/Area/Bars"
     title = ""
-    dfs = dict()
+
+    # Dataframes read by the plots
+    dfs = DataFrameCache()
+
+    # Column names of each data source (see data_source)
+    headers = dict()
+
+    # Number of plots whose data has been read by preload_data, and pinned in Plot.dfs for them, by key
+    preloaded = collections.Counter()
+
+    # Columns of each data source requested by the plots, see used_columns
+    usecols = dict()
+
+    # On-disk cache of parsed datafiles (DiskCache), None to disable it
+    diskcache = None
+
+    # Keep the frames read in less memory, see compact_data, and report the memory saved
+    compact = False
 
     # Target ax to be plotted in
     axnum = None
@@ -62,12 +1456,39 @@ class Plot:
     # Congiguration for Matplotlib fonts
     font = {}
 
-    # CSV datafile
+    # Datafile: CSV, Parquet, Arrow, NumPy or SQLite database
+    # Also a glob pattern (e.g. "results/run-*.csv") or a list of datafiles with the same columns, which are concatenated
     datafile = None
 
+    # Name of a column added after the last one of the datafiles, with the datafile each row comes from
+    source_column = None
+
+    # Data from SQLite databases: either the result of a query or the rows of table that satisfy the SQL condition where
+    query = None
+    table = None
+
+    # Rows to plot: a SQL condition for SQLite databases or a pandas query expression (e.g. "`CLOS 0` > 3 and x < 10") for other datafiles
+    where = None
+
+    # Aggregate the rows with the same values of some columns (e.g. the repetitions of an experiment) into their statistic
+    # and its error, which are plotted as the cols and error cols: {by: [0], stat: mean, error: bootstrap, resamples: 1000}
+    # - by: columns that group the rows, the index by default
+    # - stat: "mean" or "median"
+    # - error: None, "std", "sem", "percentile" or "bootstrap" (a confidence interval)
+    # - percentiles: lower and upper percentiles of the values or of the bootstrap statistics, [2.5, 97.5] by default
+    # - resamples, seed: of the bootstrap
+    aggregate = None
+
+    # Transformations of the values, in order, after they are indexed: e.g. [{rolling: 5}, {divide: 1}]
+    # Either rolling, ewm, diff, cumsum, divide, speedup or resample, see transform_data (the columns are given as positions)
+    transforms = None
+
     # Dataframe
     df = None
 
+    # Key of the dataframe in Plot.dfs
+    datakey = None
+
     cols = None # List of ints
     labels = None  # List of strings
 
@@ -114,6 +1535,12 @@ class Plot:
     # Index column
     index = None # int or list
 
+    # Parse the index columns as dates, once per datafile: strings with a strftime format (e.g. "%Y-%m-%d %H:%M:%S" or
+    # "ISO8601") or numbers of index_unit ("s", "ms", "us" or "ns") since the epoch, see parse_dates
+    # Then xmin and xmax are dates too, which limit the X axis but do not filter the rows read
+    index_format = None
+    index_unit = None
+
     colormap = None # Colormap to pick colors from
     numcolors = None
     color = None # Colors to override default style or colors from colormap
@@ -128,6 +1555,12 @@ class Plot:
     # Ax this is plotted into
     ax = None
 
+    # Legend handles and labels of artists that are not in the axes, by axes, e.g. one per line of a LineCollection
+    legend_handles = weakref.WeakKeyDictionary()
+
+    # If the X axis shows the values of the index
+    xindex = False
+
     # Put Y scale on the right
     yright = False
 
@@ -143,7 +1576,7 @@ class Plot:
 
         # If no cols are specified, we assume all but the index
         if not self.cols:
-            self.cols = [i for i in range(len(self.df.columns)) if i != self.index]
+            self.cols = [i for i in range(len(self.header)) if i != self.index]
 
         ax = plt.gca()
 
@@ -152,15 +1585,17 @@ class Plot:
         if self.labels:
             assert len(self.labels) == len(self.cols), colored("The number of labels({}) and columns({}) is different".format(len(self.labels), len(self.cols)), 'red')
             for label, col in zip(self.labels, self.cols):
-                self.colabel[self.df.columns[col]] = label
+                self.colabel[self.header[col]] = label
 
         # Store used columns names
-        self.columns = [self.df.columns[col] for col in self.cols]
+        self.columns = [self.header[col] for col in self.cols]
 
         # Set index
         if not isinstance(self.index, list):
             self.index = [self.index]
-        self.df = self.df.set_index([self.df.columns[index] for index in self.index])
+        self.index_data([self.header[index] for index in self.index])
+        if self.transforms:
+            self.transform_data()
 
         assert not isinstance(self.color, str), colored("Color has to be an iterable of strings, not '{}'".format(self.color), 'red')
 
@@ -205,16 +1640,229 @@ class Plot:
         self.legend_options = lo
 
 
+    # Index the data by the columns names, once for all the plots that share the data and the index (kept in Plot.dfs)
+    # The plots select their columns from the indexed frame, without copying it
+    def index_data(self, names):
+        key = (self.datakey, "index", tuple(names))
+        if self.dates():
+            key += (self.index_format, self.index_unit)
+        indexed = Plot.dfs[key] if key in Plot.dfs else None
+        # Also if the data has been read again with more columns
+        if indexed is None or any(name not in indexed.columns for name in self.df.columns if name not in names):
+            df = self.df
+            if self.dates():
+                df = df.assign(**{name: parse_dates(df[name], self.index_format, self.index_unit) for name in names})
+            Plot.dfs[key] = df.set_index(names)
+        self.release_data()
+        self.pin_data(key)
+
+
+    # If the index is parsed as dates
+    def dates(self):
+        return bool(self.index_format or self.index_unit)
+
+
+    # Limit of the X axis: a date if the index is parsed as dates
+    def xlimit(self, value):
+        if value == None or not self.dates():
+            return value
+        if self.index_unit and not isinstance(value, str):
+            return pd.to_datetime(value, unit=self.index_unit)
+        return pd.Timestamp(value)
+
+
+    # Errors of each column for plt.errorbar, built from the error columns (ecols) without lists:
+    # - One error column per column, shown below the value (errorbars: min), above it (max) or on both sides (both)
+    # - Two error columns per column, the lower and the upper errors (errorbars: both)
+    # Symmetric errors are views of their columns, the others (2, N) arrays
+    def errors(self):
+        ecolumns = getattr(self, "ecolumns", [])
+        if not ecolumns:
+            return [None] * len(self.columns)
+        assert self.errorbars in ["min", "max", "both"], colored("'errorbars' allowed values are 'max', 'min' or 'both'" , "red")
+        assert len(ecolumns) in [len(self.columns), 2 * len(self.columns)], \
+                colored("You have {} cols but {} error cols: error cols shold be 0, equal or double the number of cols".format(len(self.columns), len(ecolumns)), "red")
+        assert self.errorbars == "both" or len(ecolumns) == len(self.columns), colored("An error column is needed for each value column", "red")
+
+        def values(name):
+            values = self.df[name].values
+            # Matplotlib rejects negative errors, which older versions drew as their absolute value
+            return np.abs(values) if (values < 0).any() else values
+
+        if len(ecolumns) == 2 * len(self.columns):
+            return [np.stack([values(lower), values(upper)]) for lower, upper in zip(ecolumns[::2], ecolumns[1::2])]
+        if self.errorbars == "both":
+            return [values(name) for name in ecolumns]
+
+        errors = []
+        for name in ecolumns:
+            error = np.zeros((2, len(self.df)))
+            error[1 if self.errorbars == "max" else 0] = values(name)
+            errors.append(error)
+        return errors
+
+
+    # Replace the data by its transformation (see transforms), which is kept in Plot.dfs for the plots that share it
+    def transform_data(self):
+        assert not getattr(self, "ecolumns", None), colored("Error cols can not be transformed", "red")
+        transforms = []
+        for transform in self.transforms:
+            name, args = next(iter(transform.items())) if isinstance(transform, dict) else (transform, None)
+            if name in ["divide", "speedup"]:
+                args = dict(args) if isinstance(args, dict) else {"column": args}
+                args["column"] = self.header[args["column"]]
+                transform = {name: args}
+            transforms.append(transform)
+
+        key = (self.datakey, "transforms", tuple(self.df.index.names), tuple(self.columns), repr(transforms))
+        if key not in Plot.dfs:
+            Plot.dfs[key] = transform_data(self.df, self.columns, transforms)
+        self.release_data()
+        self.pin_data(key)
+
+
+    # Plot described by kwds without reading its data, e.g. to find out which data it needs
+    @classmethod
+    def unprepared(cls, **kwds):
+        obj = cls.__new__(cls)
+        obj.check_and_set(kwds)
+        return obj
+
+
     def check_and_set(self, kwds):
         for key in kwds:
             assert key in dir(self), colored("'{}' is not a valid keyword for this kind of plot".format(key), "red")
         self.__dict__.update(kwds)
 
 
+    # Merge the columns used by a plot with the ones already requested for the same data source
+    # A column is read as a value (float) only if no plot uses it as an index
+    @staticmethod
+    def register_columns(source, used):
+        requested = Plot.usecols.setdefault(source, dict())
+        for col, value in used.items():
+            requested[col] = requested.get(col, True) and value
+
+
+    # Column names of the data of a plot, read only once per datafile (or query, for SQLite databases)
+    @staticmethod
+    def source_header(datafile, query=None, table=None, where=None, source_column=None):
+        key = header_source(datafile, query, table, where, source_column)
+        if key not in Plot.headers:
+            sql = sql_query(query, table, where) if datafile_format(datafile) == "sqlite" else None
+            header = read_header(datafile, sql)
+            Plot.headers[key] = header + [source_column] if source_column != None else header
+        return Plot.headers[key]
+
+
+    def prepare_header(self):
+        self.header = Plot.source_header(self.datafile, self.query, self.table, self.where, self.source_column)
+
+        # Rows out of the limits of the X axis are filtered out as they are read
+        xmin, xmax = getattr(self, "xmin", None), getattr(self, "xmax", None)
+        bound = bound_column(self.header, self.index, xmin, xmax, self.dates())
+        rows = data_rows(self.datafile, self.query, self.table, self.where, bound, xmin, xmax)
+        self.bound = data_bound(self.datafile, bound, xmin, xmax)
+        self.source = data_source(self.datafile, rows, self.source_column, self.bound)
+
+        # CSV files sorted by the index can be read only between xmin and xmax
+        self.seek = None
+        if getattr(self, "sidecar", False) and bound != None and datafile_format(self.datafile) == "csv" and not datafile_compression(self.datafile):
+            self.seek = (bound, xmin, xmax)
+
+        # SQL query for SQLite databases, pandas query expression for other datafiles
+        self.sql = self.filter = None
+        if datafile_format(self.datafile) == "sqlite":
+            self.sql = rows
+        else:
+            self.filter = rows
+
+
+    # Keep the frame in memory until this plot is plotted
+    def pin_data(self, key):
+        self.df = Plot.dfs[key]
+        self.datakey = key
+        Plot.dfs.pin(self.datakey)
+
+
+    # Key of the data of this plot in Plot.dfs and a function that reads it
+    def data_loader(self):
+        self.prepare_header()
+
+        ecols = getattr(self, "ecols", []) + transform_columns(self.transforms)
+        self.used = used_columns(self.header, self.index, self.cols, ecols, aggregate_keys(self.aggregate, self.index))
+        Plot.register_columns(self.source, self.used)
+
+        requested = Plot.usecols[self.source]
+        columns = [self.header[col] for col in sorted(requested)]
+        dtype = {self.header[col]: np.float64 for col, value in requested.items() if value}
+        return self.source, Plot.compact_reader(lambda: cached_read_data(self.datafile, columns, dtype, self.sql, self.filter, self.seek, self.source_column, self.bound), self.datafile)
+
+
+    # Function that reads with read and, in compact memory mode, makes the frame compact and reports its footprint
+    @staticmethod
+    def compact_reader(read, datafile):
+        if not Plot.compact:
+            return read
+
+        def compact_read():
+            df = read()
+            before = frame_nbytes(df)
+            df = compact_data(df)
+            print("Memory of '{}': {:.2f} MB, {:.2f} MB compact".format(datafile, before / 2**20, frame_nbytes(df) / 2**20))
+            return df
+        return compact_read
+
+
     def prepare_data(self):
-        if self.datafile not in Plot.dfs:
-            Plot.dfs[self.datafile] = read_data(self.datafile)
-        self.df = Plot.dfs[self.datafile]
+        key, read = self.data_loader()
+
+        # Read the data if it has not been read yet or if it lacks some of the columns of this plot
+        df = Plot.dfs.get(key)
+        if df is None or any(self.header[col] not in df.columns for col in self.used):
+            Plot.dfs[key] = read()
+        self.pin_data(key)
+        if Plot.preloaded[key] > 0:
+            Plot.preloaded[key] -= 1
+            Plot.dfs.unpin(key)
+
+        if self.aggregate:
+            self.aggregate_data()
+
+
+    # Replace the data by the aggregation of its rows (see aggregate), also kept in Plot.dfs
+    # The error columns are appended to the header of this plot, and become its error cols
+    def aggregate_data(self):
+        options = {"by": None, "stat": "mean", "error": None, "percentiles": [2.5, 97.5], "resamples": 1000, "seed": 0}
+        for option in self.aggregate:
+            assert option in options, colored("'{}' is not a valid aggregate option".format(option), "red")
+        options.update(self.aggregate)
+        assert not getattr(self, "ecols", None), colored("Error cols are computed by aggregate, they can not be given", "red")
+
+        index = self.index if isinstance(self.index, list) else [self.index]
+        by = aggregate_keys(self.aggregate, self.index)
+        if not self.cols:
+            self.cols = [i for i in range(len(self.header)) if i not in index + by]
+        by, columns = [self.header[col] for col in by], [self.header[col] for col in self.cols]
+
+        key = (self.datakey, "aggregate", tuple(by), tuple(columns), options["stat"], options["error"],
+                tuple(options["percentiles"]), options["resamples"], options["seed"])
+        if key not in Plot.dfs:
+            Plot.dfs[key] = aggregate_data(self.df, by, columns, options["stat"], options["error"], options["percentiles"], options["resamples"], options["seed"])
+        self.release_data()
+        self.pin_data(key)
+
+        errors = [name for name in self.df.columns if name not in by + columns]
+        self.ecols = list(range(len(self.header), len(self.header) + len(errors)))
+        self.header = self.header + errors
+
+
+    # The data is not needed anymore, so it can be evicted from Plot.dfs
+    def release_data(self):
+        if self.datakey != None:
+            Plot.dfs.unpin(self.datakey)
+            self.datakey = None
+        self.df = None
 
 
     # Plot horizontal line
@@ -297,6 +1945,9 @@ class Plot:
     def show_legend(self, options):
         ax = plt.gca()
         handles, labels = ax.get_legend_handles_labels()
+        for handle, label in Plot.legend_handles.get(ax, []):
+            handles.append(handle)
+            labels.append(label)
 
         # Handle edge color and line width
         hec = options.pop("handleedgecolor", options.pop("hec", None))
@@ -345,7 +1996,13 @@ class Plot:
         xmax = None
         if hasattr(self, "xmax"):
             xmax = self.xmax
-        ax.set_xlim(left=xmin, right=xmax)
+        ax.set_xlim(left=self.xlimit(xmin), right=self.xlimit(xmax))
+
+        # Date axis, if the X axis shows an index of dates
+        if self.xindex and self.dates():
+            locator = mdates.AutoDateLocator()
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
 
         # X/Y tick locators
         for setter, locator in [(ax.xaxis.set_major_locator, self.xmajorlocator), (ax.yaxis.set_major_locator, self.ymajorlocator), (ax.xaxis.set_minor_locator, self.xminorlocator), (ax.yaxis.set_minor_locator, self.yminorlocator)]:
@@ -423,6 +2080,12 @@ class BoxPlot(Plot):
     kind = "box"
     xrot = 45
 
+    # The whiskers reach the furthest values within whis times the interquartile range from the box
+    whis = 1.5
+
+    # Maximum number of outliers drawn per column, None for all of them
+    maxfliers = 1000
+
     def __init__(self, **kwds):
         self.check_and_set(kwds)
         self.prepare_data()
@@ -430,14 +2093,16 @@ class BoxPlot(Plot):
 
 
     def plot_box(self):
-        columns = self.df[self.columns]
         if self.labels:
             labels = self.labels
         else:
-            labels = columns.columns
+            labels = self.columns
 
-        # Plot
-        plt.boxplot(columns.T.values.tolist(), labels=labels)
+        # Plot the summary of each column, without giving the samples to matplotlib
+        stats = [box_stats(self.df[col].values, self.whis, self.maxfliers) for col in self.columns]
+        for stat, label in zip(stats, labels):
+            stat["label"] = label
+        plt.gca().bxp(stats)
 
 
     def plot(self):
@@ -445,6 +2110,204 @@ class BoxPlot(Plot):
         super().plot()
 
 
+# Distribution of each column, estimated with kde: a violin per column (kind violin) or a line per column (kind density)
+class DensityPlot(Plot):
+    kind = "density"
+
+    linewidth = None
+    linestyle = None
+
+    # Bandwidth of the kernel: a number, "scott" or "silverman"
+    bandwidth = "scott"
+
+    # Points at which the density is estimated, and how many bandwidths it extends beyond the extremes of the values
+    gridsize = 512
+    cut = 3
+
+    # Violins
+    width = 0.7
+    showmeans = False
+    showmedians = True
+    showextrema = True
+
+    def __init__(self, **kwds):
+        self.check_and_set(kwds)
+        self.prepare_data()
+        super().__init__()
+
+
+    def density(self, column):
+        return kde(self.df[column].values, self.gridsize, self.bandwidth, self.cut)
+
+
+    def plot_violin(self):
+        if self.labels:
+            labels = self.labels
+        else:
+            labels = self.columns
+
+        stats = []
+        for column in self.columns:
+            values = self.df[column].values.astype(np.float64)
+            values = values[~np.isnan(values)]
+            coords, vals = self.density(column)
+            stats.append({"coords": coords, "vals": vals, "mean": values.mean(), "median": np.median(values),
+                          "min": values.min(), "max": values.max()})
+
+        ax = plt.gca()
+        positions = np.arange(1, len(stats) + 1)
+        parts = ax.violin(stats, positions, widths=self.width, showmeans=self.showmeans, showextrema=self.showextrema, showmedians=self.showmedians)
+        for body, color in zip(parts["bodies"], it.islice(it.cycle(self.color), self.starting_style, None)):
+            body.set_facecolor(color)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(labels)
+
+
+    def plot_density(self):
+        ax = plt.gca()
+        style_cycler = self.make_style_cycler(["color", "linewidth", "linestyle"])
+        for column, sty in zip(self.columns, style_cycler):
+            x, y = self.density(column)
+            ax.plot(x, y, label=self.colabel.get(column, column), **sty)
+
+
+    def plot(self):
+        if self.kind == "violin":
+            if self.xrot == None:
+                self.xrot = 45
+            self.plot_violin()
+        elif self.kind == "density":
+            self.plot_density()
+        else:
+            assert False, colored("Plot kind '{}' is not valid)".format(self.kind), "red")
+        super().plot()
+
+
+# Points (index, value) of all the columns counted in a fixed grid, drawn with a colorbar: as a single image of
+# rectangular bins (kind density2d) or as hexagons (kind hexbin), so the cost does not depend on the number of points
+class Density2DPlot(Plot):
+    kind = "density2d"
+    legend = False
+    xindex = True
+
+    # Limits
+    xmin = None # None / Float
+    xmax = None # None / Float
+
+    # Bins along X and Y: an int for both or [X, Y]
+    gridsize = 100
+
+    # Colormap of the counts (viridis by default), on a logarithmic scale if lognorm
+    lognorm = False
+
+    # Show a colorbar, with this label
+    colorbar = True
+    clabel = "Points"
+
+    def __init__(self, **kwds):
+        self.check_and_set(kwds)
+        self.prepare_data()
+        super().__init__()
+
+
+    # X and Y values of the points of all the columns, without missing values
+    def points(self):
+        assert self.df.index.nlevels == 1, colored("Density plots need a single index column", "red")
+        index = mdates.date2num(self.df.index) if self.dates() else self.df.index.values.astype(np.float64)
+        x = np.tile(index, len(self.columns))
+        y = np.concatenate([self.df[column].values.astype(np.float64) for column in self.columns])
+        keep = ~(np.isnan(x) | np.isnan(y))
+        if keep.all():
+            return x, y
+        return x[keep], y[keep]
+
+
+    def plot(self):
+        ax = plt.gca()
+        x, y = self.points()
+        cmap = self.colormap if self.colormap else "viridis"
+        norm = mpl.colors.LogNorm() if self.lognorm else None
+        gridsize = self.gridsize if isinstance(self.gridsize, int) else tuple(self.gridsize)
+
+        if self.kind == "hexbin":
+            mappable = ax.hexbin(x, y, gridsize=gridsize, cmap=cmap, norm=norm, mincnt=1, linewidths=0)
+        elif self.kind == "density2d":
+            xmin, xmax = self.xlimit(self.xmin), self.xlimit(self.xmax)
+            if self.dates():
+                xmin, xmax = [mdates.date2num(limit) if limit != None else None for limit in (xmin, xmax)]
+            xrange = [xmin if xmin != None else x.min(), xmax if xmax != None else x.max()]
+            yrange = [self.ymin if self.ymin != None else y.min(), self.ymax if self.ymax != None else y.max()]
+            counts, xedges, yedges = np.histogram2d(x, y, bins=gridsize, range=[xrange, yrange])
+            counts = np.ma.masked_equal(counts, 0) # Empty bins are left blank
+            mappable = ax.imshow(counts.T, origin="lower", aspect="auto", interpolation="nearest", cmap=cmap, norm=norm,
+                                 extent=[xedges[0], xedges[-1], yedges[0], yedges[-1]])
+        else:
+            assert False, colored("Plot kind '{}' is not valid)".format(self.kind), "red")
+
+        if self.colorbar:
+            plt.colorbar(mappable, ax=ax, label=self.clabel)
+        super().plot()
+
+
+# Values of the columns (Y) along the index (X) drawn as a single image, so the cost does not depend on the number of
+# columns. The rows are assumed to be evenly spaced along the index
+class HeatmapPlot(Plot):
+    kind = "heatmap"
+    legend = False
+    xindex = True
+
+    # Limits of the colormap (viridis by default), on a logarithmic scale if lognorm
+    vmin = None
+    vmax = None
+    lognorm = False
+
+    # Show a colorbar, with this label
+    colorbar = True
+    clabel = ""
+
+    # Average blocks of rows and columns down to the pixels of the plot (True) or to [X, Y] blocks
+    downsample = False
+
+    # Label the columns on the Y axis if there are at most this many
+    max_column_labels = 40
+
+    def __init__(self, **kwds):
+        self.check_and_set(kwds)
+        self.prepare_data()
+        super().__init__()
+
+
+    def plot(self):
+        ax = plt.gca()
+        assert self.df.index.nlevels == 1, colored("Heatmaps need a single index column", "red")
+        values = self.df[self.columns].values
+        if self.downsample:
+            if self.downsample == True:
+                extent = ax.get_window_extent()
+                rows, cols = int(extent.width), int(extent.height)
+            else:
+                rows, cols = self.downsample
+            values = block_means(values, rows, cols)
+
+        index = mdates.date2num(self.df.index) if self.dates() else self.df.index.values
+        if pd.api.types.is_numeric_dtype(index) and len(index) > 1:
+            xextent = [index[0], index[-1]]
+        else:
+            xextent = [-0.5, len(index) - 0.5]
+        cmap = self.colormap if self.colormap else "viridis"
+        norm = mpl.colors.LogNorm(self.vmin, self.vmax) if self.lognorm else mpl.colors.Normalize(self.vmin, self.vmax)
+        image = ax.imshow(values.T, origin="lower", aspect="auto", interpolation="nearest", cmap=cmap, norm=norm,
+                          extent=xextent + [-0.5, len(self.columns) - 0.5])
+
+        # Unless the columns have been averaged
+        if values.shape[1] == len(self.columns) <= self.max_column_labels:
+            ax.set_yticks(range(len(self.columns)))
+            ax.set_yticklabels([self.colabel.get(column, column) for column in self.columns])
+        if self.colorbar:
+            plt.colorbar(image, ax=ax, label=self.clabel)
+        super().plot()
+
+
 class BarPlot(Plot):
     kind = "bars"
 
@@ -458,12 +2321,17 @@ class BarPlot(Plot):
 
     width = 1
 
+    # How bars are drawn: "artists" (a patch per bar), "collection" (a PolyCollection per column, which is much faster
+    # with many bars) or "auto" (collection with collection_threshold bars or more)
+    renderer = "auto"
+    collection_threshold = 1000
+
     def __init__(self, **kwds):
         self.check_and_set(kwds)
         self.prepare_data()
 
         # Store used error column names
-        self.ecolumns = [self.df.columns[ecol] for ecol in self.ecols]
+        self.ecolumns = [self.header[ecol] for ecol in self.ecols]
 
         super().__init__()
 
@@ -471,6 +2339,39 @@ class BarPlot(Plot):
                 colored("You have {} cols but {} error cols: error cols shold be 0, equal or double the number of cols".format(len(self.cols), len(self.ecols)), "red")
 
 
+    # If the bars are drawn as collections, see renderer
+    def bar_collection(self, bars):
+        assert self.renderer in ["auto", "artists", "collection"], colored("Valid renderers are 'auto', 'artists' and 'collection', not '{}'".format(self.renderer), "red")
+        return self.renderer == "collection" or (self.renderer == "auto" and bars >= self.collection_threshold)
+
+
+    # Draw the bars of a column, centered at x, either with plt.bar or, if collection, as a single PolyCollection
+    # that looks the same: its geometry is built as an array, and its error bars are drawn at once
+    def draw_bars(self, x, height, label, style, yerr=None, collection=False):
+        if not collection:
+            return plt.bar(x, height, self.width, label=label, yerr=yerr, **style)
+
+        ax = plt.gca()
+        x = np.asarray(x, dtype=np.float64)
+        height = np.asarray(height, dtype=np.float64)
+        keep = ~np.isnan(height)
+        left, right = x[keep] - self.width / 2, x[keep] + self.width / 2
+        top, bottom = height[keep], np.zeros(keep.sum())
+        verts = np.stack([np.column_stack(corner) for corner in [(left, bottom), (left, top), (right, top), (right, bottom)]], axis=1)
+
+        edgecolor = mpl.rcParams["patch.edgecolor"] if mpl.rcParams["patch.force_edgecolor"] else "none"
+        hatch = style.get("hatch")
+        bars = PolyCollection(verts, facecolors=style.get("color"), edgecolors=edgecolor, linewidths=mpl.rcParams["patch.linewidth"],
+                hatch=hatch if hatch and hatch.strip() else None, label=label)
+        bars.sticky_edges.y.append(0)
+        ax.add_collection(bars)
+        ax.autoscale_view()
+
+        if yerr is not None:
+            ax.errorbar(x, height, yerr=yerr, fmt="none", ecolor="k", capsize=mpl.rcParams["errorbar.capsize"], label="_nolegend_")
+        return bars
+
+
     def plot_bars(self):
         def compute_bar_locations(df, width, bar_num):
             def sep(width):
@@ -487,31 +2388,12 @@ class BarPlot(Plot):
         ax = plt.gca()
         values = self.df[self.columns]
 
-        # Error bars
-        if self.ecols:
-            errors = self.df[self.ecolumns]
-            if self.errorbars == "max":
-                assert len(self.cols) == len(self.ecols), colored("An error column is needed for each value column", "red")
-                new_errors = list()
-                for row in errors.values.T:
-                    new_errors.append([[0] * len(row), row])
-                errors = new_errors
-            elif self.errorbars == "min":
-                assert len(self.cols) == len(self.ecols), colored("An error column is needed for each value column", "red")
-                new_errors = list()
-                for row in errors.values.T:
-                    new_errors.append([row, [0] * len(row)])
-                errors = new_errors
-            else:
-                assert self.errorbars == "both", colored("'errorbars' allowed values are 'max', 'min' or 'both'" , "red")
-                assert len(self.cols) * 2 == len(self.ecols), colored("Two error columns are needed for each value column", "red")
-                errors = errors.values.T
-        else:
-            errors = it.cycle([None])
+        errors = self.errors()
 
+        collection = self.bar_collection(values.size)
         for c, (col, ecol, sty) in enumerate(zip(values.columns, errors, style_cycler)):
             ind = compute_bar_locations(values, self.width, c)
-            bars = plt.bar(ind, values[col], self.width, label=self.colabel.get(col, col), yerr=ecol, **sty)
+            bars = self.draw_bars(ind, values[col].values, self.colabel.get(col, col), sty, ecol, collection)
 
         ind = compute_bar_locations(values, self.width, len(values.columns) / 2 - 0.5) # Positions of the xticks
         ax.set_xticks(ind)
@@ -544,50 +2426,31 @@ class BarPlot(Plot):
                 break
             styles.append(sty)
 
+        collection = self.bar_collection(values.size)
         for col, sty in zip(reversed(values.columns), reversed(styles)):
-            bars = plt.bar(ind, values[col], self.width, label=self.colabel.get(col, col), **sty)
+            bars = self.draw_bars(ind, values[col].values, self.colabel.get(col, col), sty, collection=collection)
 
         ax.set_xticks(ind)
         ax.set_xticklabels(values.index.values)
 
 
     def plot_multiindexed_bars(self):
-        def compute_bar_locations(df, width):
-            def sep(width, level):
-                return width * (1.75 * level + 0.5)
-            result = []
-            all_values = []
-            for l, level in enumerate(reversed(df.index.labels)):
-                values = []
-                prev = level[0]
-                for e in level:
-                    if e != prev:
-                        values.append(sep(width, l))
-                    else:
-                        values.append(0)
-                    prev = e
-                all_values.append(np.array(values))
-                result.append(np.cumsum(values))
-            result = np.array(result)
-            indexes = np.sum(result, axis=0)
-            for i in range(len(indexes)):
-               indexes[i] += width * i
-            return indexes
+        ax = plt.gca()
+        idx = self.df.index
+        if not isinstance(idx, pd.MultiIndex): # A single level
+            idx = pd.MultiIndex.from_arrays([idx])
+        levels = idx.nlevels
+        codes = np.array(idx.codes, dtype=np.int64).reshape(levels, -1)
 
-        def xtick_loc_per_level(df, level, bar_positions):
-            indexes = bar_positions
-            canvis = [-1] + list(np.where(np.diff(df.index.labels[level]) != 0)[0]) + [len(indexes) - 1]
-            locations = []
-            for i in range(len(canvis) - 1):
-                act = canvis[i]
-                seg = canvis[i + 1]
-                start = indexes[act + 1]
-                end = indexes[seg]
-                locations.append((start + end) / 2)
-            return locations
+        # Bars are separated by width * (1.75 * level + 0.5) for each level whose code changes, level 0 being the innermost
+        changed = np.diff(codes, axis=1) != 0
+        seps = self.width * (1.75 * np.arange(levels)[::-1] + 0.5)
+        gaps = np.concatenate([[0], (changed * seps[:, None]).sum(axis=0)])
+
+        # A group of a level starts where its code or the code of any outer level changes
+        changes = np.logical_or.accumulate(changed, axis=0)
+        ind = np.cumsum(gaps) + self.width * np.arange(len(idx))
 
-        ax = plt.gca()
-        ind = compute_bar_locations(self.df, self.width)
         values = self.df[self.columns]
         values = values.cumsum(axis=1) # To make them "stacked"
 
@@ -599,22 +2462,36 @@ class BarPlot(Plot):
                 break
             styles.append(sty)
 
+        collection = self.bar_collection(values.size)
         for col, sty in zip(reversed(values.columns), reversed(styles)):
-            bars = plt.bar(ind, values[col], self.width, label=self.colabel.get(col, col), **sty)
-
-        assert(len(values.index.levels) <= 2)
-        ax.set_xticks(xtick_loc_per_level(values, 0, ind), minor=True)
-        ax.set_xticks(xtick_loc_per_level(values, 1, ind))
-
-        idx = values.index
-
-        changes = [0] + list(np.where(np.diff(values.index.labels[0]) != 0)[0] + 1)
-        ax.set_xticklabels([idx.levels[0][idx.labels[0][l]] for l in changes], minor=True)
-
-        changes = [0] + list(np.where(np.diff(values.index.labels[1]) != 0)[0] + 1)
-        ax.set_xticklabels([idx.levels[1][idx.labels[1][l]] for l in changes])
-
-        ax.tick_params(which='minor', pad=20, length=0)
+            bars = self.draw_bars(ind, values[col].values, self.colabel.get(col, col), sty, collection=collection)
+
+        # Ticks at the center of the groups of each level, labeled with its value
+        def groups(level):
+            starts = np.concatenate([[0], np.flatnonzero(changes[level]) + 1])
+            ends = np.concatenate([starts[1:] - 1, [len(idx) - 1]])
+            return (ind[starts] + ind[ends]) / 2, idx.get_level_values(level)[starts]
+
+        # The innermost level on the major ticks, the next one on the minor ticks and the rest on secondary axes further below
+        locations, labels = groups(levels - 1)
+        ax.set_xticks(locations)
+        ax.set_xticklabels(labels)
+        self.outer_xaxis = None
+        for level in reversed(range(levels - 1)):
+            locations, labels = groups(level)
+            depth = levels - 1 - level
+            if depth == 1:
+                ax.set_xticks(locations, minor=True)
+                ax.set_xticklabels(labels, minor=True)
+                ax.tick_params(which='minor', pad=20, length=0)
+                ax.xaxis.remove_overlapping_locs = False # Groups of an odd number of bars are centered on a major tick
+            else:
+                axis = ax.secondary_xaxis("bottom")
+                axis.set_xticks(locations)
+                axis.set_xticklabels(labels)
+                axis.tick_params(pad=20 * depth, length=0)
+                axis.spines["bottom"].set_visible(False)
+                self.outer_xaxis = axis
 
 
     def plot(self):
@@ -626,9 +2503,15 @@ class BarPlot(Plot):
             self.plot_bars()
         super().plot()
 
+        # The label of the X axis goes below the ticks of the outermost level
+        if self.kind == "mibars" and self.outer_xaxis:
+            self.outer_xaxis.set_xlabel(self.ax.get_xlabel(), **self.font)
+            self.ax.set_xlabel("")
+
 
 class LinePlot(Plot):
     kind = "line"
+    xindex = True
 
     linewidth = None
     elinewidth = 1
@@ -643,21 +2526,83 @@ class LinePlot(Plot):
     xmin = None # None / Float
     xmax = None # None / Float
 
-    # Columns to use for errorbars
+    # Columns to use for errorbars, one per column or two (lower and upper) per column
     ecols = [] # List of ints
 
+    # Errorbars {'min', 'max', 'both'}
+    errorbars = "both"
+
+    # Errors drawn as error bars ("bars") or as a band around the line ("band"), a single polygon per column that is much
+    # faster to draw with many points
+    errorstyle = "bars"
+
+    # Streaming mode: the datafile is read in chunks of chunksize rows, reducing them into bins of the index as they are read
+    # The bins are either binwidth units wide or as many as bins between xmin and xmax (or the first and last index values)
+    binwidth = None # None / Float
+    bins = None # None / Int
+    binagg = "mean" # Value of each bin: "mean", "min", "max" or "last"
+    chunksize = 10**6
+
+    # The datafile is a CSV file sorted by the index: read only the lines between xmin and xmax,
+    # found with a sidecar index (<datafile>.sidx) built the first time
+    sidecar = False
+
+    # Draw only the points that the pixels of the plot can show: None, "minmax" (or True) or "lttb"
+    decimate = None
+    decimate_points = None # Points per series, by default twice the width of the plot in pixels
+
+    # How lines are drawn: "artists" (one line per column), "collection" (all the lines as a single LineCollection, which
+    # is much faster with many columns, but without markers nor error bars) or "auto" (collection with collection_threshold
+    # columns or more, if it can be used)
+    renderer = "auto"
+    collection_threshold = 100
+
     def __init__(self, **kwds):
         self.check_and_set(kwds)
         self.prepare_data()
 
-        self.ecolumns = [self.df.columns[ecol] for ecol in self.ecols]
+        self.ecolumns = [self.header[ecol] for ecol in self.ecols]
 
         super().__init__()
 
-        assert not self.ecols or len(self.cols) == len(self.ecols), \
+        assert not self.ecols or len(self.cols) == len(self.ecols) or 2 * len(self.cols) == len(self.ecols), \
                 colored("You have {} cols but {} error cols: error cols shold be 0, equal or double the number of cols".format(len(self.cols), len(self.ecols)), "red")
 
 
+    def data_loader(self):
+        if self.binwidth == None and self.bins == None:
+            return super().data_loader()
+
+        self.prepare_header()
+        assert not isinstance(self.index, list) or len(self.index) == 1, colored("Binning needs a single index column", "red")
+        assert not self.aggregate, colored("Binned data can not be aggregated", "red")
+        assert not self.dates(), colored("Binned data needs a numeric index, not dates", "red")
+        index = self.index[0] if isinstance(self.index, list) else self.index
+        self.used = used_columns(self.header, index, self.cols, self.ecols)
+        index = self.header[index]
+        columns = [self.header[col] for col in sorted(self.used) if self.used[col]]
+
+        key = (self.source, "binned", index, tuple(columns), self.binwidth, self.bins, self.binagg, self.xmin, self.xmax)
+        return key, Plot.compact_reader(lambda: read_binned_data(self.datafile, index, columns, self.binwidth, self.bins, self.binagg, self.xmin, self.xmax, self.chunksize, self.sql, self.filter, self.seek, self.bound), self.datafile)
+
+
+    # Indexes of the points of a series to draw, see decimate
+    def decimation(self, x, y):
+        if not self.decimate:
+            return slice(None)
+        method = "minmax" if self.decimate == True else self.decimate
+        assert method in ["minmax", "lttb"], colored("Valid decimation methods are 'minmax' and 'lttb', not '{}'".format(method), "red")
+
+        points = self.decimate_points
+        if not points:
+            points = 2 * int(self.ax.get_window_extent().width)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if method == "lttb":
+            return decimate_lttb(x, y, points)
+        return decimate_minmax(x, y, points)
+
+
     def plot_area(self, stacked=False):
         # Plot
         ax = self.ax
@@ -671,41 +2616,100 @@ class LinePlot(Plot):
         labels = [self.colabel.get(col, col) for col in columns]
 
         if stacked:
+            # All the series need the same x values, so the points kept for any of them are kept for all of them
+            if self.decimate:
+                keep = np.unique(np.concatenate([self.decimation(x, values) for values in y]))
+                x = x[keep]
+                y = [values[keep] for values in y]
             ax.stackplot(x, *y, colors=self.color, linewidth=lw, labels=labels)
         else:
             style_cycler = self.make_style_cycler(["color", "linewidth", "linestyle",])
             for label, values, sty in zip(labels, y, style_cycler):
-                ax.fill_between(x, values, alpha=0.5, label=label, **sty)
+                keep = self.decimation(x, values)
+                ax.fill_between(x[keep], values[keep], alpha=0.5, label=label, **sty)
+
+
+    # If the lines are drawn as a LineCollection, see renderer
+    def line_collection(self):
+        assert self.renderer in ["auto", "artists", "collection"], colored("Valid renderers are 'auto', 'artists' and 'collection', not '{}'".format(self.renderer), "red")
+        possible = not self.ecolumns and not self.marker and pd.api.types.is_numeric_dtype(self.df.index)
+        if self.renderer == "collection":
+            assert possible, colored("Lines with error bars, markers or a non numeric index can not be drawn as a collection", "red")
+        return possible and (self.renderer == "collection" or (self.renderer == "auto" and len(self.columns) >= self.collection_threshold))
+
+
+    # All the lines as one LineCollection, with an empty line per column as the handle of its legend
+    def plot_line_collection(self):
+        ax = self.ax
+        x = self.df.index.values.astype(np.float64)
+        segments = []
+        for column in self.columns:
+            y = self.df[column].values.astype(np.float64)
+            keep = ~np.isnan(y)
+            xs, ys = (x, y) if keep.all() else (x[keep], y[keep])
+            if self.decimate:
+                keep = self.decimation(xs, ys)
+                xs, ys = xs[keep], ys[keep]
+            segments.append(np.column_stack([xs, ys]))
+
+        # Style properties cycle from starting_style, as with make_style_cycler
+        def styles(prop, default):
+            value = getattr(self, prop)
+            if value == None:
+                value = default
+            if not isinstance(value, list):
+                value = [value]
+            return [value[(i + self.starting_style) % len(value)] for i in range(len(self.columns))]
+
+        colors = styles("color", None)
+        linewidths = styles("linewidth", plt.rcParams["lines.linewidth"])
+        linestyles = styles("linestyle", "-")
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=linewidths, linestyles=linestyles))
+        ax.autoscale_view()
+
+        # Detached lines as the handles of the legend, not artists of the axes
+        if self.legend:
+            handles = Plot.legend_handles.setdefault(ax, [])
+            for column, color, lw, ls in zip(self.columns, colors, linewidths, linestyles):
+                handles.append((Line2D([], [], color=color, linewidth=lw, linestyle=ls), self.colabel.get(column, column)))
 
 
     def plot_line(self):
+        assert self.errorstyle in ["bars", "band"], colored("Valid error styles are 'bars' and 'band', not '{}'".format(self.errorstyle), "red")
+        if self.line_collection():
+            return self.plot_line_collection()
+
         ax = self.ax
         columns = self.columns
-        ecolumns = self.ecolumns
-        if not ecolumns:
-            ecolumns = [None] * len(columns)
+        errors = self.errors()
 
         style_props = ["color", "linewidth", "linestyle", "marker", "markersize", "markevery", "markeredgecolor", "markeredgewidth", "elinewidth"]
         style_cycler = self.make_style_cycler(style_props)
 
 
-        for column, ecolumn, sty in zip(columns, ecolumns, style_cycler):
-            if ecolumn:
-                data = self.df[[column, ecolumn]]
+        index = self.df.index.values
+        for column, yerr, sty in zip(columns, errors, style_cycler):
+            # The rows with missing values are skipped by indexing the arrays of the column, not copying the frame
+            y = self.df[column].values
+            missing = pd.isna(y)
+            if yerr is not None:
+                missing |= pd.isna(yerr).any(axis=0) if yerr.ndim == 2 else pd.isna(yerr)
+
+            x = index
+            if missing.any():
+                keep = np.flatnonzero(~missing)
+                x, y, yerr = x[keep], y[keep], yerr[..., keep] if yerr is not None else None
+            if self.decimate:
+                keep = self.decimation(x, y)
+                x, y, yerr = x[keep], y[keep], yerr[..., keep] if yerr is not None else None
+
+            if yerr is not None and self.errorstyle == "band":
+                sty.pop("elinewidth", None)
+                line, = ax.plot(x, y, label=self.colabel.get(column, column), **sty)
+                lower, upper = (yerr, yerr) if yerr.ndim == 1 else yerr
+                ax.fill_between(x, y - lower, y + upper, color=line.get_color(), alpha=0.3, linewidth=0)
             else:
-                data = self.df[column]
-
-            data = data.dropna()
-            x = data.index.values
-
-            if ecolumn:
-                yerr = data[ecolumn].tolist()
-                y = data[column].tolist()
-            else:
-                yerr = None
-                y = data.tolist()
-
-            plt.errorbar(x, y, yerr=yerr, label=self.colabel.get(column, column), axes=ax, **sty)
+                plt.errorbar(x, y, yerr=yerr, label=self.colabel.get(column, column), axes=ax, **sty)
 
 
     def plot(self):
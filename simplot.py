@@ -55,6 +55,13 @@ def parse_args(args=None):
     parser.add_argument('--size', type=float, nargs=2, default=(11.6, 8.2), metavar=('X', 'Y'), help='Size of the figure in inches.')
     parser.add_argument('--rect', type=float, nargs=4, default=[0, 0, 1, 1], metavar=('LEFT', 'BOTTOM', 'RIGHT', 'TOP'), help='Relative size of all the plots and titles in the figure.')
     parser.add_argument('--dpi', type=int, default=100, help='Dots Per Inch.')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of datafiles read in parallel before plotting.')
+    parser.add_argument('--cache-dir', default=None, help='Directory where parsed datafiles are cached between runs. The cache is disabled by default.')
+    parser.add_argument('--memory-budget', type=float, default=None, metavar='MB', help='Maximum memory in MB used to keep parsed datafiles. '
+            'The least recently used datafiles that are not needed anymore are freed first. No limit by default.')
+    parser.add_argument('--cache-size', type=float, default=1024, metavar='MB', help='Maximum size of the cache directory in MB. The least recently used entries are removed first.')
+    parser.add_argument('--compact-memory', action='store_true', help='Keep parsed datafiles in less memory: float32 values when the difference can not be seen, '
+            'categorical strings and small integers. The memory used by each datafile before and after is reported.')
 
     args =  parser.parse_args(args)
 
@@ -81,8 +88,13 @@ def default_args():
 
 def main():
     args = parse_args()
+    if args.memory_budget != None:
+        plot.Plot.dfs.budget = args.memory_budget * 2**20
+    plot.Plot.compact = args.compact_memory
+    if args.cache_dir:
+        plot.Plot.diskcache = plot.DiskCache(args.cache_dir, args.cache_size * 2**20)
     figs, axes, axes_r = create_figures(args.grid, args.size, args.dpi)
-    plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
     write_output(figs, args.output, args.rect)
 
 
@@ -110,22 +122,41 @@ def create_figures(grids, size, dpi):
     return figures, axes, axes_r
 
 
+# Class of the plots of a kind
+def plot_class(kind):
+    if kind in ["bars", "b", "stackedbars", "sb", "mibars"]:
+        return plot.BarPlot
+    elif kind == "box":
+        return plot.BoxPlot
+    elif kind in ["violin", "density"]:
+        return plot.DensityPlot
+    elif kind in ["density2d", "hexbin"]:
+        return plot.Density2DPlot
+    elif kind == "heatmap":
+        return plot.HeatmapPlot
+    else:
+        return plot.LinePlot
+
+
 # Iterate plots and plot
-def plot_data(figs, axes, axes_r, plots, titles, equal_xaxes_groups, equal_yaxes_groups, rect):
+def plot_data(figs, axes, axes_r, plots, titles, equal_xaxes_groups, equal_yaxes_groups, rect, jobs=1):
     assert titles == [] or len(figs) == len(titles), colored("If --title is used, a title for each figure must be provided", 'red')
 
     # An axis is set visible when/if something is plotted on it
     for ax in axes + axes_r:
         ax.get_yaxis().set_visible(False)
 
+    # Tell which columns of each datafile are used, so the plots sharing a datafile read it only once
+    for desc in plots:
+        plot.request_columns(desc)
+
+    # Read all the data sources in parallel before plotting
+    if jobs > 1:
+        plot.preload_data([plot_class(desc["kind"]).unprepared(**desc) for desc in plots], jobs)
+
     axnum = 0
     for p, desc in enumerate(plots):
-        if desc["kind"] in ["bars", "b", "stackedbars", "sb", "mibars"]:
-            plots[p] = plot.BarPlot(**desc)
-        elif desc["kind"] == "box":
-            plots[p] = plot.BoxPlot(**desc)
-        else:
-            plots[p] = plot.LinePlot(**desc)
+        plots[p] = plot_class(desc["kind"])(**desc)
 
         obj = plots[p]
 
@@ -149,6 +180,7 @@ def plot_data(figs, axes, axes_r, plots, titles, equal_xaxes_groups, equal_yaxes
         plt.sca(ax)
         ax.autoscale(enable=True, axis='both', tight=True)
         obj.plot()
+        obj.release_data()
 
     # When having two Y axis the legend of the left axis my be drawn below the data. This is a workaround
     for ax, ax_r in zip(axes, axes_r):
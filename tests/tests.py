@@ -1,8 +1,18 @@
+import plot
 import simplot
 
+import bz2
+import concurrent.futures
+import glob
+import gzip
+import lzma
 import matplotlib as mpl
 import matplotlib.pyplot as plt
+import numpy as np
+import os.path as osp
+import pandas as pd
 import shlex
+import sqlite3
 from matplotlib.testing.decorators import image_comparison
 
 
@@ -237,3 +247,592 @@ def test_some_bars():
     figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
     simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
     fig = figs[0]
+
+
+def test_column_projection():
+    plot.Plot.dfs.clear()
+    plot.Plot.usecols.clear()
+    args =  " --plot '{kind: l, index: 0, cols: [1], datafile: data/stp.csv}'"
+    args += " --plot '{kind: l, index: 0, cols: [3], datafile: data/stp.csv}'"
+    args += " -g 1 2 --size 4 2.5 --dpi 100"
+
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    df = plot.Plot.dfs["data/stp.csv"]
+    assert list(df.columns) == ["x", "y1", "y3"]
+    assert df["y1"].dtype == np.float64
+    plt.close("all")
+
+
+def test_disk_cache(tmp_path):
+    cache = plot.DiskCache(str(tmp_path))
+    plot.Plot.diskcache = cache
+    try:
+        df1 = plot.cached_read_data("data/stp.csv", ["x", "y2"], {"y2": np.float64})
+        df2 = plot.cached_read_data("data/stp.csv", ["x", "y2"], {"y2": np.float64})
+    finally:
+        plot.Plot.diskcache = None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache.entries()) == 1
+    assert df1.equals(df2)
+
+    # Other columns of the same datafile are read from the same entry
+    cache = plot.DiskCache(str(tmp_path / "columns"))
+    plot.Plot.diskcache = cache
+    try:
+        dfs = [plot.cached_read_data("data/stp.csv", columns, {c: np.float64 for c in columns[1:]}) for columns in [["x", "y1"], ["x", "y2"], ["x", "y1", "y2"], ["x", "y1"]]]
+    finally:
+        plot.Plot.diskcache = None
+    assert (cache.hits, cache.misses) == (3, 1) and len(cache.entries()) == 1
+    assert dfs[2].equals(pd.read_csv("data/stp.csv", usecols=["x", "y1", "y2"], dtype={"y1": np.float64, "y2": np.float64}))
+    assert list(dfs[1].columns) == ["x", "y2"] and dfs[0].equals(dfs[3])
+
+    # Many threads reading (each datafile twice at once) and evicting from a cache that only fits a few entries
+    datafiles = []
+    for i in range(64):
+        datafiles.append(str(tmp_path / "data{}.csv".format(i)))
+        pd.DataFrame({"x": np.arange(500), "y": np.linspace(0, 1, 500) + i}).to_csv(datafiles[-1], index=False)
+    cache = plot.DiskCache(str(tmp_path / "small"), 60000)
+    plot.Plot.diskcache = cache
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as pool:
+            dfs = list(pool.map(lambda f: plot.cached_read_data(f, ["x", "y"]), datafiles * 2))
+    finally:
+        plot.Plot.diskcache = None
+    assert all(df["y"].iloc[0] == i % 64 for i, df in enumerate(dfs))
+    assert 0 < len(cache.entries()) < 64 and not glob.glob(str(tmp_path / "small" / ".*"))
+
+
+def test_dataframe_cache_eviction():
+    df = pd.DataFrame({"a": np.arange(1000, dtype=np.float64)})
+    size = df.memory_usage(deep=True).sum()
+    cache = plot.DataFrameCache(budget=2 * size)
+    cache["x"] = df
+    cache.pin("x")
+    cache["y"] = df.copy()
+    cache["z"] = df.copy()
+    # x is pinned, so y is the one evicted
+    assert "x" in cache and "y" not in cache and "z" in cache
+    cache.unpin("x")
+    cache["w"] = df.copy()
+    assert "x" not in cache
+    assert cache.get("z") is not None and cache.get("y") is None
+    assert cache.stats()["evictions"] == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_binned_area():
+    binned = plot.read_binned_data("data/cos.csv", "Seconds", ["CLOS 0", "CLOS 1"], bins=10, chunksize=7)
+    df = pd.read_csv("data/cos.csv")
+    width = (df["Seconds"].max() - df["Seconds"].min()) / 10
+    bins = np.minimum(np.floor((df["Seconds"] - df["Seconds"].min()) / width), 9)
+    assert np.allclose(df.groupby(bins)[["CLOS 0", "CLOS 1"]].mean().values, binned[["CLOS 0", "CLOS 1"]].values)
+
+    args =  " --plot '{kind: sa, datafile: data/cos.csv, index: 0, bins: 20, chunksize: 10}'"
+    args += " --size 4 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    assert len(axes[0].collections[0].get_paths()[0].vertices) < 2 * len(df)
+    plt.close("all")
+
+
+def test_decimation():
+    x = np.arange(100000, dtype=np.float64)
+    y = np.sin(x / 1000) + np.random.rand(len(x))
+    y[5000:20000] = np.nan
+    for decimate in [plot.decimate_minmax, plot.decimate_lttb]:
+        keep = decimate(x, y, 800)
+        assert len(keep) < 1000
+        assert np.nanmax(y[keep]) == np.nanmax(y) and np.nanmin(y[keep]) == np.nanmin(y)
+        assert np.isnan(y[keep]).any()
+
+
+def test_binary_datafiles(tmp_path):
+    df = pd.read_csv("data/stp.csv")
+    datafiles = [str(tmp_path / "stp.parquet"), str(tmp_path / "stp.feather"), str(tmp_path / "stp.npy"), str(tmp_path / "stp.npz")]
+    df.to_parquet(datafiles[0])
+    df.to_feather(datafiles[1])
+    np.save(datafiles[2], df.to_records(index=False))
+    np.savez(datafiles[3], **{name: df[name].values for name in df.columns})
+
+    for datafile in datafiles:
+        assert plot.read_header(datafile) == list(df.columns)
+        data = plot.read_data(datafile, ["x", "y2"])
+        assert list(data.columns) == ["x", "y2"]
+        assert np.array_equal(data["y2"].values, df["y2"].values)
+        chunks = list(plot.read_chunks(datafile, ["x", "y1"], chunksize=7))
+        assert np.array_equal(pd.concat(chunks)["y1"].values, df["y1"].values)
+
+
+def test_sqlite(tmp_path):
+    datafile = str(tmp_path / "results.db")
+    df = pd.read_csv("data/stp.csv")
+    with sqlite3.connect(datafile) as con:
+        df.to_sql("stp", con, index=False)
+
+    args =  " --plot '{kind: l, index: 0, cols: [1, 2], datafile: %s, table: stp, where: x > 5}'" % datafile
+    args += " --plot '{kind: l, index: 0, cols: [1], datafile: %s, query: \"SELECT x, y1 + y2 AS y FROM stp\"}'" % datafile
+    args += " -g 1 2 --size 4 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+
+    where = plot.Plot.dfs[(datafile, 'SELECT * FROM (SELECT * FROM "stp") WHERE x > 5')]
+    assert list(where.columns) == ["x", "y1", "y2"] and (where["x"] > 5).all()
+    query = plot.Plot.dfs[(datafile, "SELECT x, y1 + y2 AS y FROM stp")]
+    assert np.allclose(query["y"].values, df["y1"].values + df["y2"].values)
+    plt.close("all")
+
+
+def test_where_and_xlimits(tmp_path):
+    args =  " --plot '{kind: l, index: 0, cols: [1], datafile: data/stp.csv, xmin: 3.5, xmax: 10.5}'"
+    args += " --plot '{kind: l, index: 0, cols: [2], datafile: data/stp.csv, where: \"y2 > 3\"}'"
+    args += " -g 1 2 --size 4 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    # The rows right outside the limits are kept, so the line reaches the edges of the plot
+    limited = plot.Plot.dfs[("data/stp.csv", None, None, ("x", 3.5, 10.5))]
+    assert list(limited["x"]) == list(range(3, 12))
+    assert tuple(axes[0].get_lines()[0].get_xdata()[[0, -1]]) == (3, 11) and axes[0].get_xlim() == (3.5, 10.5)
+    assert (plot.Plot.dfs[("data/stp.csv", "y2 > 3")]["y2"] > 3).all()
+    plt.close("all")
+
+    df = pd.read_csv("data/stp.csv")
+    datafile = str(tmp_path / "stp.parquet")
+    df.to_parquet(datafile)
+    where = "x >= 5 and not (`y1` < 3 or x in [7, 8])"
+    expected = df.query(where)[["x", "y2"]].reset_index(drop=True)
+    assert plot.read_data(datafile, ["x", "y2"], where=where).equals(expected)
+    assert plot.read_data("data/stp.csv", ["x", "y2"], where=where).equals(expected)
+    # Bounded in chunks and pushed down to pyarrow and SQLite, with the closest rows outside the bound
+    for chunksize in [1, 4, 100]:
+        chunks = plot.read_chunks("data/stp.csv", ["x", "y2"], chunksize=chunksize, where=where, bound=("x", 6.5, 12))
+        assert list(pd.concat(list(chunks))["x"]) == [6, 9, 10, 11, 12, 13]
+    assert list(plot.read_data(datafile, ["x", "y2"], where=where, bound=("x", 6.5, 12))["x"]) == [6, 9, 10, 11, 12, 13]
+    database = str(tmp_path / "stp.db")
+    with sqlite3.connect(database) as con:
+        df.to_sql("stp", con, index=False)
+    sql = plot.data_rows(database, table="stp", where="x >= 5", bound="x", xmin=6.5, xmax=12)
+    assert list(plot.read_data(database, ["x", "y2"], query=sql)["x"]) == [6, 7, 8, 9, 10, 11, 12, 13]
+
+    # A column that is not numeric after all is read with the inferred types, as without a filter
+    datafile = str(tmp_path / "text.csv")
+    pd.DataFrame({"x": np.arange(10), "y": [1, 2, 3, "bad", 5, 6, 7, 8, 9, 10]}).to_csv(datafile, index=False)
+    dtype = {"x": np.float64, "y": np.float64}
+    for chunksize in [2, 100]:
+        chunks = plot.read_chunks(datafile, ["x", "y"], dtype, chunksize=chunksize, where="x > 1", bound=("x", 2, 4))
+        assert list(pd.concat(list(chunks))["y"].astype(str)) == ["3", "bad", "5", "6"]
+
+
+def test_sidecar_index(tmp_path):
+    datafile = str(tmp_path / "trace.csv")
+    df = pd.DataFrame({"time": np.arange(10000) / 10, "value": np.random.rand(10000)})
+    df.to_csv(datafile, index=False)
+
+    values, offsets, header = plot.sidecar_index(datafile, "time", step=100)
+    assert len(values) == 100 and header == b"time,value\n"
+    with open(datafile, "rb") as f:
+        f.seek(offsets[10])
+        assert float(f.readline().split(b",")[0]) == values[10]
+
+    where = "`time` >= 12.3 and `time` <= 45.6"
+    data = plot.read_data(datafile, ["time", "value"], where=where, seek=("time", 12.3, 45.6))
+    assert np.allclose(data.values, df.query(where).values)
+    assert len(plot.csv_range(datafile, "time", 12.3, 45.6).getvalue()) < osp.getsize(datafile) / 4
+
+    # Comments before the header
+    commented = str(tmp_path / "commented.csv")
+    with open(commented, "w") as f:
+        f.write("# Generated by a tool\n\n")
+        df.to_csv(f, index=False)
+    data = plot.read_data(commented, ["time", "value"], where=where, seek=("time", 12.3, 45.6))
+    assert np.allclose(data.values, df.query(where).values)
+
+    # Unsorted between two samples: the whole file is read
+    unsorted = str(tmp_path / "unsorted.csv")
+    df.assign(time=np.r_[df["time"].values[:5000], df["time"].values[5000:5999][::-1], df["time"].values[5999:]]).to_csv(unsorted, index=False)
+    assert plot.csv_range(unsorted, "time", 500, 510) is None
+    assert len(plot.read_data(unsorted, ["time", "value"], where="`time` >= 500 and `time` <= 510", seek=("time", 500, 510))) == 101
+
+
+# Keys of the frames in Plot.dfs but the indexed ones, see Plot.index_data
+def unindexed_frames():
+    return [key for key in plot.Plot.dfs.frames if not (isinstance(key, tuple) and key[1:2] == ("index",))]
+
+
+def test_parallel_loading(tmp_path):
+    plot.Plot.dfs.clear()
+    misses = plot.Plot.dfs.misses
+    args =  " --plot '{kind: l, index: 0, cols: [1, 2], datafile: data/stp.csv}'"
+    args += " --plot '{kind: area, index: 0, datafile: data/cos.csv}'"
+    args += " --plot '{kind: b, index: 0, cols: [1], datafile: data/progress_estimation.csv}'"
+    args += " --plot '{kind: l, index: 0, cols: [3], datafile: data/stp.csv}'"
+    args += " -g 2 2 --size 4 2.5 --dpi 100 -j 4"
+    line, args = args, simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    # Every datafile has been read once, before plotting, with the columns of all its plots
+    assert plot.Plot.dfs.misses == misses and len(unindexed_frames()) == 3
+    assert list(plot.Plot.dfs["data/stp.csv"].columns) == ["x", "y1", "y2", "y3"]
+    plt.close("all")
+
+    # With a small memory budget, the preloaded frames are kept until their plots use them
+    plot.Plot.dfs.clear()
+    budget, plot.Plot.dfs.budget = plot.Plot.dfs.budget, 1
+    read, reads = plot.cached_read_data, []
+    plot.cached_read_data = lambda datafile, *args: reads.append(datafile) or read(datafile, *args)
+    try:
+        args = simplot.parse_args(shlex.split(line))
+        figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+        simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    finally:
+        plot.cached_read_data, plot.Plot.dfs.budget = read, budget
+    assert sorted(reads) == ["data/cos.csv", "data/progress_estimation.csv", "data/stp.csv"] and not +plot.Plot.dfs.pins
+    plt.close("all")
+
+    # The parallel reads share a disk cache that only fits a few entries
+    datafiles = []
+    for i in range(24):
+        datafiles.append(str(tmp_path / "data{}.csv".format(i)))
+        pd.DataFrame({"x": np.arange(500), "y": np.linspace(0, 1, 500) + i}).to_csv(datafiles[-1], index=False)
+    line = "".join(" --plot '{{kind: l, index: 0, datafile: {}, axnum: 0}}'".format(f) for f in datafiles) + " -j 16"
+    cache = plot.DiskCache(str(tmp_path / "cache"), 20000)
+    plot.Plot.diskcache = cache
+    try:
+        for run in range(2):
+            plot.Plot.dfs.clear()
+            args = simplot.parse_args(shlex.split(line))
+            figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+            simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+            assert [line.get_ydata()[0] for line in axes[0].get_lines()] == list(range(24))
+            plt.close("all")
+    finally:
+        plot.Plot.diskcache = None
+    assert cache.hits + cache.misses == 48 and 0 < len(cache.entries()) < 24
+
+
+def test_compressed_datafiles(tmp_path):
+    df = pd.read_csv("data/cos.csv")
+    for ext, opener in [(".gz", gzip.open), (".xz", lzma.open), (".bz2", bz2.open)]:
+        datafile = str(tmp_path / ("cos.csv" + ext))
+        with open("data/cos.csv", "rb") as src, opener(datafile, "wb") as dst:
+            dst.write(src.read())
+        assert plot.read_header(datafile) == list(df.columns)
+        assert plot.read_data(datafile, ["Seconds", "CLOS 2"]).equals(df[["Seconds", "CLOS 2"]])
+        chunks = plot.read_chunks(datafile, ["Seconds", "CLOS 1"], chunksize=10, where="`CLOS 1` > 5")
+        assert pd.concat(chunks).equals(df[df["CLOS 1"] > 5][["Seconds", "CLOS 1"]])
+
+
+def test_multiple_datafiles(tmp_path):
+    plot.Plot.dfs.clear()
+    df = pd.read_csv("data/stp.csv")
+    for run in range(3):
+        (df + run).to_csv(str(tmp_path / "run-{}.csv".format(run)), index=False)
+    pattern = str(tmp_path / "run-*.csv")
+    runs = [str(tmp_path / "run-{}.csv".format(run)) for run in range(3)]
+    assert plot.datafiles(pattern) == runs
+    assert plot.read_data(runs[:2], ["x", "y1"])["y1"].equals(pd.concat([df["y1"], df["y1"] + 1], ignore_index=True))
+
+    args =  " --plot '{{kind: l, index: 6, cols: [1], datafile: \"{}\", source_column: run}}'".format(pattern)
+    args += " --plot '{{kind: l, index: 0, cols: [2], datafile: \"{}\", source_column: run}}'".format(pattern)
+    args += " -g 1 2 --size 4 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    # The datafiles are read and concatenated once, with the columns of both plots and the datafile of each row
+    data = plot.Plot.dfs[(pattern, None, "run")]
+    assert len(unindexed_frames()) == 1 and len(data) == 3 * len(df)
+    assert list(data.columns) == ["x", "y1", "y2", "run"]
+    assert list(data["run"].cat.categories) == runs
+    plt.close("all")
+
+
+def test_aggregate(tmp_path):
+    plot.Plot.dfs.clear()
+    rng = np.random.default_rng(0)
+    x = np.repeat(np.arange(20), 30)
+    df = pd.DataFrame({"x": x, "rep": np.tile(np.arange(30), 20), "y": x + rng.standard_normal(len(x))})
+    datafile = str(tmp_path / "reps.csv")
+    df.to_csv(datafile, index=False)
+
+    std = plot.aggregate_data(df, ["x"], ["y"], error="std")
+    assert list(std.columns) == ["x", "y", "y std"] and np.allclose(std["y std"], df.groupby("x")["y"].std())
+    # The bootstrap interval of the mean is close to the normal one
+    ci = plot.aggregate_data(df, ["x"], ["y"], error="bootstrap", resamples=2000)
+    sem = df.groupby("x")["y"].sem().values
+    assert list(ci.columns) == ["x", "y", "y lower", "y upper"]
+    assert np.allclose(ci["y lower"], 1.96 * sem, rtol=0.25) and np.allclose(ci["y upper"], 1.96 * sem, rtol=0.25)
+    # A few large groups, with the resamples drawn in chunks
+    values, codes = rng.standard_normal(20000), np.repeat([0, 1], 10000)
+    for stat in ["mean", "median"]:
+        lower, upper = plot.bootstrap(values, codes, 2, stat, [2.5, 97.5], resamples=300, rng=np.random.default_rng(1), batch=2**12)
+        center = [getattr(np, stat)(values[codes == c]) for c in [0, 1]]
+        assert np.allclose(upper - lower, 2 * 1.96 / np.sqrt(10000) * (1 if stat == "mean" else 1.25), rtol=0.25)
+        assert ((lower < center) & (center < upper)).all()
+
+    args =  " --plot '{{kind: l, index: 0, cols: [2], datafile: {}, aggregate: {{error: bootstrap}}}}'".format(datafile)
+    args += " --plot '{{kind: b, index: 0, cols: [2], datafile: {}, aggregate: {{stat: median, error: percentile}}}}'".format(datafile)
+    args += " --plot '{{kind: b, index: 0, cols: [2], datafile: {}, aggregate: {{error: sem}}}}'".format(datafile)
+    args += " -g 1 3 --size 6 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    # The datafile is read once, and aggregated once per plot
+    assert len(unindexed_frames()) == 4 and plot.Plot.dfs[datafile].shape == (600, 2)
+    plt.close("all")
+
+
+def test_transforms():
+    plot.Plot.dfs.clear()
+    df = pd.read_csv("data/stp.csv").set_index("x")
+    speedup = plot.transform_data(df, ["y1", "y2"], [{"speedup": "y1"}, {"rolling": {"window": 3, "min_periods": 1}}])
+    assert np.allclose(speedup["y1"], 1) and np.allclose(speedup["y2"], (df["y1"] / df["y2"]).rolling(3, min_periods=1).mean())
+    deltas = plot.transform_data(df, ["y3"], ["cumsum", "diff"])
+    assert np.allclose(deltas["y3"].values[1:], df["y3"].values[1:])
+    resampled = plot.transform_data(df, ["y1"], [{"resample": {"rule": 10, "stat": "max"}}])
+    assert list(resampled.index) == [0, 10, 20, 30, 40] and resampled["y1"].iloc[1] == df["y1"].loc[10:19].max()
+
+    args =  " --plot '{kind: l, index: 0, cols: [2, 3], datafile: data/stp.csv, transforms: [{divide: 1}, {ewm: 4}]}'"
+    args += " --plot '{kind: l, index: 0, cols: [2, 3], datafile: data/stp.csv, transforms: [{divide: 1}, {ewm: 4}], axnum: 0}'"
+    args += " --size 4 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    # Both plots share the transformed data, computed once
+    assert len(unindexed_frames()) == 2
+    plt.close("all")
+
+
+def test_compact_memory():
+    df = plot.read_data("data/multiindexed_bars.csv")
+    compact = plot.compact_data(df)
+    assert all(compact[name].dtype == "category" for name in ["i1", "i2"])
+    assert compact["col1"].dtype == np.float32 and plot.frame_nbytes(compact) < plot.frame_nbytes(df)
+    # Values that float32 can not tell apart at the resolution of a plot are kept as they are
+    times = pd.DataFrame({"t": 1.6e9 + np.arange(100.0), "n": np.arange(100)})
+    compact = plot.compact_data(times)
+    assert compact["t"].dtype == np.float64 and compact["n"].dtype == np.int8
+
+
+def test_shared_index():
+    plot.Plot.dfs.clear()
+    args = "".join(" --plot '{{kind: l, index: 0, cols: [{}], datafile: data/stp.csv, axnum: 0}}'".format(col) for col in range(1, 6))
+    args = simplot.parse_args(shlex.split(args + " --size 4 2.5 --dpi 100"))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    # All the plots use the same indexed frame
+    indexed = plot.Plot.dfs[("data/stp.csv", "index", ("x",))]
+    assert list(indexed.columns) == ["y1", "y2", "y3", "y4", "y5"] and len(plot.Plot.dfs) == 2
+    assert len(axes[0].get_lines()) == 5
+    plt.close("all")
+
+
+def test_line_collection():
+    args =  " --plot '{kind: l, index: 0, datafile: data/stp.csv, renderer: collection, colormap: viridis}'"
+    args += " --plot '{kind: dl, index: 0, datafile: data/stp.csv, collection_threshold: 5}'"
+    args += " --plot '{kind: ml, index: 0, datafile: data/stp.csv, collection_threshold: 5}'"
+    args += " -g 1 3 --size 6 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    for ax, ax_r in zip(axes[:2], axes_r):
+        collection, = [c for c in ax.collections if isinstance(c, mpl.collections.LineCollection)]
+        assert len(collection.get_segments()) == 5
+        # Lines out of the axes are the handles of the legend (moved to the right axes by plot_data)
+        legend, = [artist for artist in ax_r.artists if isinstance(artist, mpl.legend.Legend)]
+        assert [text.get_text() for text in legend.get_texts()] == ["y1", "y2", "y3", "y4", "y5"]
+        assert not ax.get_lines()
+    assert axes[0].get_xlim() == (1, 45)
+    # Markers need a line per column
+    assert not axes[2].collections or not isinstance(axes[2].collections[0], mpl.collections.LineCollection)
+    plt.close("all")
+
+
+def test_bar_collection():
+    args =  " --plot '{kind: b, datafile: data/progress_estimation.csv, index: 0, cols: [1,2], ecols: [3,4], errorbars: max, hatch: [\" \", \"//\"], renderer: collection}'"
+    args += " --plot '{kind: sb, datafile: data/prog_vs_ways.csv, index: 0, hatch: [\"///\", \"\"], collection_threshold: 100}'"
+    args += " --plot '{kind: sb, datafile: data/prog_vs_ways.csv, index: 0}'"
+    args += " -g 1 3 --size 9 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect, args.jobs)
+    polys = [[c for c in ax.collections if isinstance(c, mpl.collections.PolyCollection)] for ax in axes]
+    # A collection per column, with its hatch, as the handle of its legend
+    assert [len(p) for p in polys] == [2, 7, 0] and len(axes[2].patches) == 7 * 28
+    assert polys[0][1].get_hatch() == "//" and polys[1][-1].get_hatch() == "///"
+    assert [len(p.get_paths()) for p in polys[1]] == [28] * 7
+    assert axes[0].get_legend_handles_labels()[0] == polys[0]
+    # The bars start at 0, as with patches
+    assert axes[0].get_ylim()[0] == 0 and axes[1].get_ylim() == axes[2].get_ylim()
+    plt.close("all")
+
+
+def test_multilevel_bars():
+    args = """ --plot '{kind: mibars, datafile: data/multiindexed_bars.csv, index: [0, 1, 2], cols: [3, 4], xlabel: X Label}' --size 5 3 --dpi 100"""
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    ax = axes[0]
+    # Innermost level on the major ticks, the next one on the minor ticks and the outermost one on a secondary axis
+    assert [t.get_text() for t in ax.get_xticklabels()] == list("abcdefghI")
+    assert [t.get_text() for t in ax.get_xticklabels(minor=True)] == ["foo", "bar", "baz", "luu"]
+    assert list(ax.get_xticks(minor=True)) == [1.5, 8.25, 18.25, 22.75]
+    outer = ax.child_axes[0]
+    assert [t.get_text() for t in outer.get_xticklabels()] == ["betha", "alpha"] and outer.get_xlabel() == "X Label"
+    plt.close("all")
+
+    # The gap between bars depends on the levels whose value changes, as with two levels before
+    df = pd.DataFrame({"a": ["A", "B", "C"], "b": ["x", "x", "x"], "v": [1.0, 2, 3]}).set_index(["a", "b"])
+    obj = plot.BarPlot.unprepared(kind="mibars", width=1, renderer="artists")
+    obj.df, obj.columns, obj.colabel, obj.color, obj.hatch = df, ["v"], {}, ["C0"], [" "]
+    plt.figure()
+    obj.plot_multiindexed_bars()
+    assert [p.get_x() + p.get_width() / 2 for p in plt.gca().patches] == [0, 3.25, 6.5]
+    plt.close("all")
+
+    # A single level, with no minor ticks nor secondary axes
+    args = """ --plot '{kind: mibars, datafile: data/multiindexed_bars.csv, index: [2], cols: [3, 4]}' --size 5 3 --dpi 100"""
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    ax = axes[0]
+    assert [t.get_text() for t in ax.get_xticklabels()] == list("abcdefghI")
+    assert list(ax.get_xticks()) == [1.5 * i for i in range(9)]
+    assert not ax.get_xticklabels(minor=True) and not ax.child_axes
+    plt.close("all")
+
+
+def test_errorbars():
+    args =  " --plot '{kind: l, datafile: data/progress_estimation.csv, index: 0, cols: [1, 2], ecols: [3, 4], errorbars: max}'"
+    args += " --plot '{kind: b, datafile: data/progress_estimation.csv, index: 0, cols: [1], ecols: [3, 4]}'"
+    args += " --plot '{kind: l, datafile: data/progress_estimation.csv, index: 0, cols: [1], ecols: [3, 4], errorstyle: band}'"
+    args += " -g 1 3 --size 9 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    df = pd.read_csv("data/progress_estimation.csv")
+    # Errors only above the line
+    segments = axes[0].containers[0].lines[2][0].get_segments()
+    assert np.allclose([s[0][1] for s in segments], df.iloc[:, 1]) and np.allclose([s[1][1] for s in segments], df.iloc[:, 1] + df.iloc[:, 3])
+    # Lower and upper errors
+    segments = [c for c in axes[1].get_children() if isinstance(c, mpl.collections.LineCollection)][0].get_segments()
+    assert np.allclose([s[0][1] for s in segments], df.iloc[:, 1] - df.iloc[:, 3])
+    assert np.allclose([s[1][1] for s in segments], df.iloc[:, 1] + df.iloc[:, 4])
+    # A band from the lower to the upper error
+    band = axes[2].collections[0].get_paths()[0].vertices[:, 1]
+    assert np.isclose(band.min(), (df.iloc[:, 1] - df.iloc[:, 3]).min()) and np.isclose(band.max(), (df.iloc[:, 1] + df.iloc[:, 4]).max())
+    plt.close("all")
+
+
+def test_box_stats(tmp_path):
+    values = np.random.default_rng(0).lognormal(size=10001)
+    stats = plot.box_stats(values)
+    expected = mpl.cbook.boxplot_stats(values)[0]
+    for name in ["med", "q1", "q3", "whislo", "whishi", "mean"]:
+        assert np.isclose(stats[name], expected[name])
+    assert np.array_equal(stats["fliers"], np.sort(expected["fliers"]))
+    capped = plot.box_stats(values, maxfliers=10)["fliers"]
+    assert len(capped) == 10 and capped[0] == stats["fliers"][0] and capped[-1] == stats["fliers"][-1]
+
+    args = " --plot '{kind: box, datafile: data/cos.csv, index: 0, cols: [1, 2, 3], maxfliers: 5, labels: [A, B, C]}' --size 4 2.5 --dpi 100"
+    args = simplot.parse_args(shlex.split(args))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    assert [t.get_text() for t in axes[0].get_xticklabels()] == ["A", "B", "C"]
+    plt.close("all")
+
+    # The outliers are capped by default
+    datafile = str(tmp_path / "latencies.csv")
+    pd.DataFrame({"x": np.arange(10**5), "latency": np.random.default_rng(0).lognormal(sigma=2, size=10**5)}).to_csv(datafile, index=False)
+    args = simplot.parse_args(shlex.split(" --plot '{{kind: box, datafile: {}, index: 0}}' --size 4 2.5 --dpi 100".format(datafile)))
+    figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+    simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+    assert len(plot.box_stats(pd.read_csv(datafile)["latency"])["fliers"]) > plot.BoxPlot.maxfliers
+    assert max(len(line.get_ydata()) for line in axes[0].get_lines()) == plot.BoxPlot.maxfliers
+    plt.close("all")
+
+
+def test_kde():
+    values = np.random.default_rng(0).normal(size=2000)
+    x, y = plot.kde(values, bandwidth=0.3)
+    exact = np.exp(-0.5 * ((x[:, None] - values[None, :]) / 0.3) ** 2).sum(axis=1) / (len(values) * 0.3 * np.sqrt(2 * np.pi))
+    assert np.abs(y - exact).max() < 1e-3 * exact.max()
+    assert np.isclose(y.sum() * (x[1] - x[0]), 1, atol=1e-3)
+
+    for kind in ["violin", "density"]:
+        args = " --plot '{{kind: {}, datafile: data/cos.csv, index: 0, cols: [1, 2, 3], labels: [A, B, C]}}' --size 4 2.5 --dpi 100".format(kind)
+        args = simplot.parse_args(shlex.split(args))
+        figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+        simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+        if kind == "violin":
+            assert [t.get_text() for t in axes[0].get_xticklabels()] == ["A", "B", "C"]
+        else:
+            assert [line.get_label() for line in axes[0].get_lines()] == ["A", "B", "C"]
+        plt.close("all")
+
+
+def test_density2d():
+    df = pd.read_csv("data/stalls_slowdown_correlation.csv")
+    for kind in ["density2d", "hexbin"]:
+        args = " --plot '{{kind: {}, datafile: data/stalls_slowdown_correlation.csv, index: 4, cols: [5], gridsize: [20, 10], colormap: magma}}' --size 4 2.5 --dpi 100".format(kind)
+        args = simplot.parse_args(shlex.split(args))
+        figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+        simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+        mappable = axes[0].images[0] if kind == "density2d" else axes[0].collections[0]
+        assert mappable.get_array().sum() == df.iloc[:, [4, 5]].dropna().shape[0]
+        if kind == "density2d":
+            assert mappable.get_array().shape == (10, 20)
+        plt.close("all")
+
+
+def test_heatmap():
+    values = np.arange(24, dtype=np.float64).reshape(6, 4)
+    values[0, 0] = np.nan
+    means = plot.block_means(values, 3, 2)
+    assert means.shape == (3, 2) and means[0, 0] == np.mean([1, 4, 5]) and means[2, 1] == np.mean([18, 19, 22, 23])
+
+    df = pd.read_csv("data/cos.csv")
+    for extra, shape in [("", (4, len(df))), (", downsample: [10, 2]", (2, 10))]:
+        args = " --plot '{{kind: heatmap, datafile: data/cos.csv, index: 0, labels: [A, B, C, D]{}}}' --size 4 2.5 --dpi 100".format(extra)
+        args = simplot.parse_args(shlex.split(args))
+        figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+        simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+        assert len(axes[0].images) == 1 and axes[0].images[0].get_array().shape == shape
+        if not extra:
+            assert [t.get_text() for t in axes[0].get_yticklabels()] == ["A", "B", "C", "D"]
+        plt.close("all")
+
+
+def test_date_index(tmp_path):
+    dates = pd.date_range("2024-02-28 22:00:00", periods=1000, freq="37min")
+    strings = pd.Series(dates.strftime("%Y-%m-%dT%H:%M:%S"))
+    assert (plot.parse_dates(strings, "%Y-%m-%dT%H:%M:%S") == pd.Series(dates)).all()
+    fields = plot.fixed_width_fields("%Y-%m-%dT%H:%M:%S")
+    assert (plot.parse_fixed_width(plot.fixed_width_chars(strings, 19), fields) == dates).all()
+    # By blocks of rows, down to an invalid string in the last one
+    assert (plot.parse_fixed_width(plot.fixed_width_chars(strings, 19), fields, rows=64) == dates).all()
+    assert plot.parse_fixed_width(plot.fixed_width_chars(pd.concat([strings, pd.Series(["2024-02-30T00:00:00"])]), 19), fields, rows=64) is None
+    assert (plot.parse_dates(pd.Series(dates.strftime("%d/%m/%Y %H:%M")), "%d/%m/%Y %H:%M") == pd.Series(dates.floor("min"))).all()
+    # Not fixed-width or not valid dates are parsed by pandas, or rejected
+    assert (plot.parse_dates(pd.Series(["2024-2-1"]), "%Y-%m-%d") == pd.Series([pd.Timestamp("2024-02-01")])).all()
+    # Fields missing from the format default to 1900-01-01, with and without fixed width
+    for times in [["12:00:01", "13:00:02"], ["12:00:01", "3:00:02"]]:
+        assert (plot.parse_dates(pd.Series(times), "%H:%M:%S") == pd.to_datetime(pd.Series(times), format="%H:%M:%S")).all()
+    for invalid in ["2023-02-29", "2023/02/28", "2023-0a-28"]:
+        assert plot.parse_fixed_width(plot.fixed_width_chars(pd.Series([invalid]), 10), plot.fixed_width_fields("%Y-%m-%d")) is None
+
+    epochs = dates.values.astype("datetime64[s]").astype(np.int64)
+    datafile = str(tmp_path / "dates.csv")
+    pd.DataFrame({"time": strings, "epoch": epochs, "value": np.arange(1000)}).to_csv(datafile, index=False)
+    for index, options, xmin in [(0, 'index_format: "%Y-%m-%dT%H:%M:%S", xmin: "2024-03-01"', pd.Timestamp("2024-03-01")), (1, "index_unit: s, xmin: {}".format(epochs[100]), dates[100])]:
+        args = " --plot '{{kind: l, datafile: {}, index: {}, cols: [2], {}}}' --size 4 2.5 --dpi 100".format(datafile, index, options)
+        args = simplot.parse_args(shlex.split(args))
+        figs, axes, axes_r = simplot.create_figures(args.grid, args.size, args.dpi)
+        simplot.plot_data(figs, axes, axes_r, args.plot, args.title, args.equal_xaxes, args.equal_yaxes, args.rect)
+        assert (axes[0].get_lines()[0].get_xdata() == dates.values).all()
+        assert isinstance(axes[0].xaxis.get_major_formatter(), mpl.dates.ConciseDateFormatter)
+        assert np.isclose(axes[0].get_xlim()[0], mpl.dates.date2num(xmin))
+        plt.close("all")